@@ -14,6 +14,8 @@ ax.grid(which='major', linestyle='-', linewidth='0.5', color='gray')
 from libCommon import INI_BASE, INI_READ, INI_WRITE
 from libDecorators import exit_on_exception, singleton
 from libFinance import STOCK_TIMESERIES, HELPER as FINANCE
+from libStore import PRICE_STORE, CALENDAR
+from libMetrics import ROLLING
 from libDebug import trace
 from libGraph import LINE, BAR, POINT, save, HELPER as GRAPH
 '''
@@ -31,7 +33,7 @@ def get_globals(*largs) :
 
 @singleton
 class VARIABLES() :
-    var_names = [ 'cli', "env", "local_dir", "data_store", "category","input_file",'output_file', 'background','benchmark','repo_stock']
+    var_names = [ 'cli', "env", "local_dir", "data_store", "category","input_file",'output_file', 'background','benchmark','repo_stock','price_store']
 
     def __init__(self) :
         values = get_globals(*VARIABLES.var_names)
@@ -66,6 +68,9 @@ class EXTRACT_PRICES() :
         return flag_1 or flag_2 or flag_3
     @classmethod
     def read(cls, value_list) :
+        ret = cls.readStore(value_list)
+        if len(ret) == len(value_list) :
+           return ret
         repo = VARIABLES().repo_stock
         ret = {}
         for name, data in STOCK_TIMESERIES.read(repo, value_list) :
@@ -73,8 +78,18 @@ class EXTRACT_PRICES() :
             ret[name] = data
         return ret
     @classmethod
+    def readStore(cls, value_list) :
+        path = VARIABLES().price_store
+        if not PRICE_STORE.exists(path) :
+           return {}
+        data = PRICE_STORE.open(path).read(TRANSFORM_PRICES._prices, value_list)
+        ret = {}
+        for name in data.columns.values :
+            ret[name] = data[[name]].dropna().rename(columns={name:TRANSFORM_PRICES._prices})
+        return ret
+    @classmethod
     def smartMassage(cls,data) :
-        data.fillna(method='backfill',inplace=True)
+        data = CALENDAR.instance().align(data, fill='bfill', head='bfill')
         data = data / data.iloc[0]
         data = data - 1
         key_list = sorted(data.columns.values)
@@ -314,7 +329,7 @@ class TRANSFORM_PORTFOLIO() :
     def getPortfolioPrice(cls,weights,prices) :
         logging.info(weights.shape)
         logging.info(prices.shape)
-        ret = prices.fillna(0)
+        prices = CALENDAR.instance().align(prices, fill='ffill', head='bfill')
         ret = weights.dot(prices.T).dropna(how="all").T
         return ret
     @classmethod
@@ -491,6 +506,8 @@ def process() :
         price_summary[target_From] = prices[target_From]
         text_summary[target_To] = summary.loc['portfolio']
 
+    rolling_summary = ROLLING.find(price_summary, FINANCE.YEAR, period=FINANCE.YEAR)['SHARPE']
+    rolling_summary = rolling_summary.dropna(how='all')
     price_summary = EXTRACT_PRICES.smartMassage(price_summary)
     logging.info(price_summary)
 
@@ -521,12 +538,12 @@ def process() :
     logging.info(sharpe_summary) # should be price list, that does not make sense
     logging.info(text_summary)
     logging.info(_portfolio_name_list)
-    return returns, diversified, price_summary, sharpe_summary, text_summary, _portfolio_name_list
+    return returns, diversified, price_summary, rolling_summary, sharpe_summary, text_summary, _portfolio_name_list
 
 @exit_on_exception
 @trace
 def main() :
-   returns, diversified, graph_summary, graph_portfolio_sharpe_list, text_summary, portfolio_name_list = process()
+   returns, diversified, graph_summary, graph_rolling, graph_portfolio_sharpe_list, text_summary, portfolio_name_list = process()
    summary_path_list = []
    logging.info(graph_portfolio_sharpe_list)
    POINT.plot(graph_portfolio_sharpe_list,x='RISK',y='RETURNS',ylabel="Returns", xlabel="Risk", title="Sharpe Ratio")
@@ -544,6 +561,11 @@ def main() :
    path = "{}/images/portfolio_summary.png".format(local_dir)
    save(path)
    summary_path_list.append(path)
+   LINE.plot(graph_rolling, title="Rolling Sharpe Ratio")
+   GRAPH.tick_right()
+   path = "{}/images/portfolio_rolling_sharpe.png".format(local_dir)
+   save(path)
+   summary_path_list.append(path)
 
    graph_list = diversified['graph']
    name_list = diversified['name']
@@ -571,7 +593,7 @@ def main() :
        save(path, ncol=3)
        local_returns_list.append(path)
 
-   summary = { "images" : summary_path_list , "captions" : ["Return over Risk", "portfolio returns"] }
+   summary = { "images" : summary_path_list , "captions" : ["Return over Risk", "portfolio returns", "one year rolling sharpe ratio"] }
    summary['table'] = text_summary
    portfolio = {}
    for i, value in enumerate(local_diversify_list) :
@@ -610,6 +632,7 @@ if __name__ == '__main__' :
    benchmark = [ x for x in ini_list if 'benchmark' in x ]
    repo_stock = env.list_filenames('local/historical_prices/*pkl')
    repo_fund = env.list_filenames('local/historical_prices_fund/*pkl')
+   price_store = "{pwd_parent}/local/price_store".format(**vars(env))
    input_file = env.list_filenames('local/method*portfolios.ini')
 
    local_dir = "{pwd_parent}/local".format(**vars(env))
@@ -1,10 +1,13 @@
 #!/usr/bin/env python
 
 import logging
+from functools import partial
+import numpy as np
 import pandas as pd
 from libCommon import INI_READ,INI_WRITE
-from libUtils import combinations
+from libUtils import combinations, prefetch
 from libFinance import STOCK_TIMESERIES, HELPER as FINANCE
+from libStore import PRICE_STORE, CALENDAR, SHARED_MATRIX
 from newSharpe import PORTFOLIO as MONTERCARLO
 from libDebug import pprint, trace, cpu
 from libDecorators import exit_on_exception, log_on_exception, singleton
@@ -21,7 +24,7 @@ def get_globals(*largs) :
 
 @singleton
 class VARIABLES() :
-    var_names = ["cli", "local_dir", "background_files", "price_list","ini_list",'floats_in_summary', 'columns_drop','disqualified']
+    var_names = ["cli", "local_dir", "background_files", "price_list", "price_store", "ini_list",'floats_in_summary', 'columns_drop','disqualified']
 
     def __init__(self) :
         values = get_globals(*VARIABLES.var_names)
@@ -230,14 +233,19 @@ class PORTFOLIO():
         return ret
     @classmethod
     @trace
-    def portfolio(cls, prices, stocks, portfolio_iterations, ret = None) :
+    def portfolio(cls, prices, stocks, portfolio_iterations, ret = None, seed = None) :
         if ret is None :
            ret = pd.DataFrame()
-        max_sharpe, min_dev = MONTERCARLO.find(prices, stocks=stocks, portfolios=portfolio_iterations, period=FINANCE.YEAR)
+        max_sharpe, min_dev = MONTERCARLO.find(prices, stocks=stocks, portfolios=portfolio_iterations, period=FINANCE.YEAR, seed=seed)
         ret = ret.append(max_sharpe)
         ret = ret.append(min_dev)
         return ret
     @classmethod
+    def merge(cls, ret, portfolio) :
+        if ret is None :
+           return portfolio
+        return ret.append(portfolio)
+    @classmethod
     def massage(cls, ret) :
         ret.fillna(0,inplace=True)
         portfolio_id_list = ret.columns.values.tolist()
@@ -280,40 +288,60 @@ class STEP_01() :
         return ret
 
 class STEP_02() :
-    def __init__(self, price_list, price_column) :
+    def __init__(self, price_list, price_column, price_store=None) :
         self.price_list = price_list
         self.price_column = price_column
+        self.lookup = None
+        self.price_store = None
+        if PRICE_STORE.exists(price_store) :
+           self.price_store = PRICE_STORE.open(price_store)
+        dates = None if self.price_store is None else self.price_store.dates
+        self.calendar = CALENDAR.instance(dates)
     def __repr__(self):
-        return f"Historical loader (column:{self.price_column})"
+        return f"Historical loader (column:{self.price_column}, store:{self.price_store})"
     def load(self, *ticker_list):
-        filename_list = map(lambda ticker : '/{}.pkl'.format(ticker), ticker_list)
-        filename_list = list(filename_list)
-        logging.info((ticker_list,filename_list))
+        if self.price_store is None or self.price_column not in self.price_store.fields :
+           return self.load_files(*ticker_list)
+        ret = self.price_store.read(self.price_column, ticker_list)
+        ret = ret.dropna(how='all')
+        ret = ret.to_dict('series')
+        missing = filter(lambda ticker : ticker not in ret, ticker_list)
+        missing = list(missing)
+        if len(missing) > 0 :
+           ret.update(self.load_files(*missing))
+        return ret
+    def load_files(self, *ticker_list):
+        if self.lookup is None :
+           self.lookup = STOCK_TIMESERIES.lookup(self.price_list)
+        logging.info(ticker_list)
         ret = {}
-        for i, suffix in enumerate(filename_list) :
-            filename = filter(lambda x : x.endswith(suffix), self.price_list)
-            filename = list(filename)
-            if len(filename) == 0 :
+        for ticker in ticker_list :
+            filename = self.lookup.get(ticker,None)
+            if filename is None :
                continue
-            filename = filename[0]
             name, temp = STOCK_TIMESERIES.load(filename)
-            key = ticker_list[i]
-            ret[key] =  temp[self.price_column]
+            ret[ticker] =  temp[self.price_column]
         return ret
     def act(self, data):
         ticker_list = data.index.values.tolist()
         ret = self.load(*ticker_list)
-        ret = pd.DataFrame(ret)
-        ret.fillna(method='bfill', inplace=True)
+        ret = self.calendar.align(ret, fill='bfill', head='bfill')
         logging.debug(ret)
         return ret
 
 class STEP_03() :
-    def __init__(self, portfolio_iterations,columns_drop) :
+    '''
+    workers > 0 searches the subsets on that many processes, prices are placed in shared memory once
+    results are merged in subset order, the same way as a sequential run
+    every subset draws from its own child of seed, so any workers count gives the same portfolios for a seed
+    '''
+    def __init__(self, portfolio_iterations,columns_drop, workers=0, seed=None) :
         self.portfolio_iterations = portfolio_iterations
         self.columns_drop = columns_drop
+        self.workers = workers
+        self.seeds = MONTERCARLO.seeds(seed)
     def __repr__(self):
-        return f"Portfolio Generator (iterations:{self.portfolio_iterations},remove columns {self.columns_drop})"
+        return f"Portfolio Generator (iterations:{self.portfolio_iterations},remove columns {self.columns_drop}, workers:{self.workers})"
     def stocks(self, data) :
         ret = data.drop(labels=self.columns_drop,errors='ignore')
         stock_list, minimum_portfolio_size = TRANSFORM.validate(ret)
@@ -331,11 +359,36 @@ class STEP_03() :
             count = len(stock_list)-1
             if count < 3 :
                break
+    @classmethod
+    def search(cls, spec, portfolio_iterations, task) :
+        '''
+        one (subset, seed) on a pool worker, prices are attached from shared memory
+        '''
+        stock_list, seed = task
+        with SHARED_MATRIX.attach(spec) as prices :
+             data = prices.frame()[stock_list]
+        return PORTFOLIO.portfolio(data,stock_list,portfolio_iterations,seed=seed)
+    def portfolios(self, prices, subsets) :
+        '''
+        (stock_list, portfolios) of every subset, in order
+        '''
+        task_list = zip(subsets, self.seeds)
+        if self.workers < 1 :
+           for stock_list, seed in task_list :
+               yield stock_list, PORTFOLIO.portfolio(prices,stock_list,self.portfolio_iterations,seed=seed)
+           return
+        shared = SHARED_MATRIX.create(prices)
+        try :
+           func = partial(self.search, shared.spec, self.portfolio_iterations)
+           for task, ret in prefetch(func, task_list, self.workers, processes=True) :
+               yield task[0], ret
+        finally :
+           shared.unlink()
     def act(self, data, prices) :
         ret = None
-        for stock_list in self.stocks(data) :
+        for stock_list, portfolio in self.portfolios(prices, self.stocks(data)) :
             logging.info(stock_list)
-            ret = PORTFOLIO.portfolio(prices,stock_list,self.portfolio_iterations,ret)
+            ret = PORTFOLIO.merge(ret, portfolio)
             ret = PORTFOLIO.truncate_1000(ret)
         if ret is None :
             return ret
@@ -346,10 +399,11 @@ class STEP_03() :
         logging.info(ret)
         return ret
 class STEP_04() :
-    def __init__(self, portfolio_iterations,threshold, columns_drop) :
+    def __init__(self, portfolio_iterations,threshold, columns_drop, seed=None) :
         self.portfolio_iterations = portfolio_iterations
         self.threshold = threshold
         self.columns_drop = columns_drop
+        self.seeds = MONTERCARLO.seeds(seed)
     def __repr__(self):
         return f"Sweet Spot (iterations:{self.portfolio_iterations},remove columns {self.columns_drop}, threshold : {self.threshold})"
     def find_average(self, ret):
@@ -370,7 +424,7 @@ class STEP_04() :
         avg, stock_list = self.find_average(data)
         total.extend(stock_list)
         ret = None
-        ret = PORTFOLIO.portfolio(prices,stock_list,self.portfolio_iterations*5,ret)
+        ret = PORTFOLIO.portfolio(prices,stock_list,self.portfolio_iterations*5,ret,next(self.seeds))
         ret = ret.drop_duplicates().T
         ret['summary'] = avg
         ret.fillna(0, inplace=True)
@@ -449,9 +503,10 @@ def process_fund(local_dir,suffix, data, step_01, step_02, step_03, step_04) :
 @trace
 def main() : 
     step_01 = STEP_01(VARIABLES().sector_cap,VARIABLES().reduce_risk,VARIABLES().reduce_returns)
-    step_02 = STEP_02(VARIABLES().price_list,VARIABLES().prices)
-    step_03 = STEP_03(VARIABLES().portfolio_iterations,VARIABLES().columns_drop)
-    step_04 = STEP_04(VARIABLES().portfolio_iterations,VARIABLES().threshold,VARIABLES().columns_drop)
+    step_02 = STEP_02(VARIABLES().price_list,VARIABLES().prices,VARIABLES().price_store)
+    seed_03, seed_04 = np.random.SeedSequence(VARIABLES().seed).spawn(2)
+    step_03 = STEP_03(VARIABLES().portfolio_iterations,VARIABLES().columns_drop,VARIABLES().workers,seed_03)
+    step_04 = STEP_04(VARIABLES().portfolio_iterations,VARIABLES().threshold,VARIABLES().columns_drop,seed_04)
     reduce_99 = STEP_01(25,1,2)
     for msg in [step_01,step_02,step_03,step_04] :
         logging.info(repr(msg))
@@ -487,6 +542,8 @@ if __name__ == '__main__' :
    parser.add_argument('--prices', action='store', dest='prices', default='Adj Close', help='Open|Close|Adj Close|Volume')
    parser.add_argument('--suffix', action='store', dest='suffix',default="",help='Store a simple value')
    parser.add_argument('--entity', action='store', dest='entity',default="",help='stock|fund')
+   parser.add_argument('--workers', action='store', dest='workers', type=int, default=0, help='Processes searching portfolios, 0 runs them in this one')
+   parser.add_argument('--seed', action='store', dest='seed', type=int, default=None, help='Reproduce the portfolios of an earlier run (its logged seed entropy)')
    cli = vars(parser.parse_args())
 
    local_dir = "{}/local".format(env.pwd_parent)
@@ -495,6 +552,7 @@ if __name__ == '__main__' :
    background_files = filter(lambda x : 'stock_' in x or 'fund_' in x, background)
    background_files = list(background_files)
    price_list = env.list_filenames('local/historical_*/*pkl')
+   price_store = '{}/price_store'.format(local_dir)
    floats_in_summary = ['CAGR','RETURNS','RISK','SHARPE','LEN'] 
    columns_drop = ['returns','risk','sharpe','mean']
    # too risky AMZN 
@@ -4,7 +4,9 @@ import logging
 import pandas as pd
 from libCommon import INI_READ, INI_WRITE
 from libUtils import ENVIRONMENT, DICT_HELPER, mkdir
-from libBackground import main as EXTRACT_BACKGROUND, load as TICKER, TRANSFORM_TICKER
+from libBackground import main as EXTRACT_BACKGROUND, load as TICKER, TRANSFORM_TICKER, EXTRACT_TICKER
+from libMetrics import RISK
+from libStore import CALENDAR
 from libDecorators import singleton, exit_on_exception, log_on_exception
 from libDebug import trace, debug_object
 
@@ -34,9 +36,26 @@ def get_benchmarks(config,benchmarks,omit_list) :
     logging.info(ret)
     return ret
 
+def extended(data_store, stock_list, benchmark) :
+    if benchmark not in stock_list :
+       logging.warning('{} is not a benchmark, no extended metrics'.format(benchmark))
+       return pd.DataFrame()
+    ret = {}
+    for ticker, data in EXTRACT_TICKER.load_list(data_store, stock_list) :
+        if data is None or 'Adj Close' not in data :
+           logging.warning('{} has no Adj Close'.format(ticker))
+           continue
+        ret[ticker] = data['Adj Close']
+    if benchmark not in ret :
+       logging.warning('{} could not be loaded, no extended metrics'.format(benchmark))
+       return pd.DataFrame()
+    prices = CALENDAR().align(ret, fill=None)
+    ret = RISK.find(prices, benchmark)
+    return pd.DataFrame(ret)
+
 @singleton
 class VARIABLES() :
-    var_names = ['env','data_store','output_file','config_file','benchmarks','omit_list']
+    var_names = ['env','data_store','output_file','config_file','benchmarks','omit_list','benchmark','incremental']
     def __init__(self) :
         values = get_globals(*VARIABLES.var_names)
         self.__dict__.update(**values)
@@ -59,8 +78,9 @@ def main() :
 
     data = VARIABLES().data
     stock_list = VARIABLES().stock_names
-    TICKER(data_store=data_store, ticker_list=stock_list)
-    ret = EXTRACT_BACKGROUND(data_store=data_store, ticker_list=stock_list)
+    TICKER(data_store=data_store, ticker_list=stock_list, incremental=VARIABLES().incremental)
+    ret = EXTRACT_BACKGROUND(data_store=data_store, ticker_list=stock_list, incremental=VARIABLES().incremental)
+    ret = pd.concat([ret, extended(data_store, stock_list, VARIABLES().benchmark)])
     ret = ret.T
     names = TRANSFORM_TICKER.data(data)
     names = pd.DataFrame([names]).T
@@ -89,5 +109,8 @@ if __name__ == '__main__' :
    benchmarks = ['Index','MOTLEYFOOL','PERSONAL']
    benchmarks = ['Index']
    omit_list = ['ACT Symbol', 'CQS Symbol', 'alias', 'unknown']
+   benchmark = '^GSPC'
+   # advance the metrics saved by the last run, only the days since then are read
+   incremental=True
 
    main()
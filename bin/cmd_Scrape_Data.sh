@@ -1,7 +1,12 @@
 #!/bin/bash
 python=python3
+# ./cmd_Scrape_Data.sh --full wipes every saved ticker first and fetches all history again
+# the default run keeps them, cmd_Scrape_Tickers.py only fetches the days missing since the last run
+full=${1:-}
 function scrape_prices {
-   find ../local/historical* -type f -delete
+   if [ "$full" == "--full" ] ; then
+      find ../local/historical* -type f -delete
+   fi
    $python cmd_Scrape_Benchmarks.py
    #Execution speed for main : , seconds : 58.5
    $python cmd_Scrape_Tickers.py
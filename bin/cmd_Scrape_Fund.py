@@ -5,7 +5,6 @@ import pandas as pd
 from libCommon import INI_READ, INI_WRITE
 from libNASDAQ import NASDAQ, TRANSFORM_FUND as FUND
 from libBackground import EXTRACT_TICKER
-from libFinance import TRANSFORM_BACKGROUND
 from libDecorators import singleton, exit_on_exception, log_on_exception
 from libDebug import trace, debug_object
 
@@ -20,7 +19,7 @@ def get_globals(*largs) :
 
 @singleton
 class VARIABLES() :
-    var_names = ['env','save_file',"data_store"]
+    var_names = ['env','save_file',"data_store",'incremental']
     def __init__(self) :
         values = get_globals(*VARIABLES.var_names)
         self.__dict__.update(**values)
@@ -50,17 +49,12 @@ def filter_by_type(fund) :
 
 @exit_on_exception
 @trace
-def action(data_store,fund_list) : 
+def action(data_store,fund_list, workers=4, incremental=False) : 
     ret = {}
     transpose = {}
-    for ticker in fund_list.keys() :
+    ticker_list = filter(lambda ticker : not filter_by_type(fund_list[ticker])[0], fund_list.keys())
+    for ticker, entry in EXTRACT_TICKER.metrics(data_store, ticker_list, workers, incremental) :
         flag, _type, category, name = filter_by_type(fund_list[ticker])
-        if flag :
-           continue
-
-        prices = EXTRACT_TICKER.load(data_store, ticker)
-        entry = TRANSFORM_BACKGROUND.find(prices)
-        del prices
         if 'LEN' not in entry :
            continue
         entry['NAME'] = name
@@ -84,7 +78,7 @@ def get_tickers() :
 @trace
 def main() : 
     fund_list = get_tickers()
-    ret, transpose = action(VARIABLES().data_store,fund_list)
+    ret, transpose = action(VARIABLES().data_store,fund_list,incremental=VARIABLES().incremental)
 
     INI_WRITE.write(VARIABLES().save_file,**transpose)
     logging.info("results saved to {}".format(VARIABLES().save_file))
@@ -102,6 +96,8 @@ if __name__ == '__main__' :
 
    save_file = '{}/local/fund_background.ini'.format(env.pwd_parent)
    data_store = '{}/local/historical_prices_fund'.format(env.pwd_parent)
+   # advance the metrics saved by the last run, only the days since then are read
+   incremental=True
 
    main()
 
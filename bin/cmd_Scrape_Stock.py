@@ -6,7 +6,6 @@ import pandas as pd
 from libCommon import INI_BASE, INI_WRITE, INI_READ
 from libNASDAQ import NASDAQ
 from libBackground import EXTRACT_TICKER
-from libFinance import TRANSFORM_BACKGROUND
 from libDecorators import singleton, exit_on_exception, log_on_exception
 from libDebug import trace, debug_object
 
@@ -21,7 +20,7 @@ def get_globals(*largs) :
 
 @singleton
 class VARIABLES() :
-    var_names = ['env','save_file',"data_store", 'sector_file']
+    var_names = ['env','save_file',"data_store", 'sector_file', 'incremental']
     def __init__(self) :
         values = get_globals(*VARIABLES.var_names)
         self.__dict__.update(**values)
@@ -44,9 +43,7 @@ def enrich_background(sector_file,background, entity = 'stock') :
             ret[ticker] = { 'SECTOR' : key, 'NAME' : name, 'ENTITY' : entity }
     return ret
 
-def add_background(ticker,data_store, background) :
-    prices = EXTRACT_TICKER.load(data_store, ticker)
-    ret = TRANSFORM_BACKGROUND.find(prices)
+def add_background(ticker,ret, background) :
     if ticker in background :
        ret.update(background[ticker])
     logging.debug(ret)
@@ -54,11 +51,11 @@ def add_background(ticker,data_store, background) :
 
 @exit_on_exception
 @trace
-def action(data_store,ticker_list, background) :
+def action(data_store,ticker_list, background, workers=4, incremental=False) :
     ret = {}
     transpose = {}
-    for ticker in ticker_list :
-        entry = add_background(ticker,data_store,background)
+    for ticker, entry in EXTRACT_TICKER.metrics(data_store, ticker_list, workers, incremental) :
+        entry = add_background(ticker,entry,background)
         ret[ticker] = entry
         for key in entry :
             if key not in transpose :
@@ -72,7 +69,7 @@ def main() :
     data_store = VARIABLES().data_store
     ticker_list, background = get_tickers()
     background = enrich_background(VARIABLES().sector_file, background)
-    ret, transpose = action(data_store, ticker_list, background)
+    ret, transpose = action(data_store, ticker_list, background, incremental=VARIABLES().incremental)
 
     INI_WRITE.write(VARIABLES().save_file,**transpose)
     logging.info("results saved to {}".format(VARIABLES().save_file))
@@ -90,6 +87,8 @@ if __name__ == '__main__' :
    save_file = '{}/local/stock_background.ini'.format(env.pwd_parent)
    data_store = '{}/local/historical_prices'.format(env.pwd_parent)
    sector_file = '{}/local/stock_by_sector.ini'.format(env.pwd_parent)
+   # advance the metrics saved by the last run, only the days since then are read
+   incremental=True
 
    main()
 
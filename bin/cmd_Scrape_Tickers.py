@@ -19,7 +19,7 @@ def get_globals(*largs) :
 
 @singleton
 class VARIABLES() :
-    var_names = ['env','data_store_stock', 'data_store_fund','wait_on_success','wait_on_failure']
+    var_names = ['env','data_store_stock', 'data_store_fund','price_store','wait_on_success','wait_on_failure','incremental','compact']
     def __init__(self) :
         values = get_globals(*VARIABLES.var_names)
         self.__dict__.update(**values)
@@ -30,27 +30,31 @@ class VARIABLES() :
 class LOAD() :
       @classmethod
       @trace
-      def _prices(cls, wait_on_failure, local_dir, ticker,dud) :
+      def _prices(cls, wait_on_failure, local_dir, ticker,dud,incremental=False) :
           if dud is None :
              dud = []
           filename = '{}/{}.pkl'.format(local_dir,ticker)
           reader = STOCK_TIMESERIES.init()
-          prices = reader.extract_from_yahoo(ticker)
+          if incremental :
+             prices = reader.refresh(filename, ticker)
+          else :
+             prices = reader.extract_from_yahoo(ticker)
           if prices is None :
              dud.append(ticker)
              time.sleep(wait_on_failure)
              return dud
-          STOCK_TIMESERIES.save(filename, ticker, prices)
+          if not incremental :
+             STOCK_TIMESERIES.save(filename, ticker, prices)
           del prices
           return dud
 
       @classmethod
-      def prices(cls,local_dir, wait_on_success, wait_on_failure, ticker_list) :
+      def prices(cls,local_dir, wait_on_success, wait_on_failure, ticker_list, incremental=False) :
           dud = None
           total = len(ticker_list)
           for i, ticker in enumerate(ticker_list) :
               logging.info("{} ({}/{})".format(ticker,i,total))
-              dud = cls._prices(wait_on_failure, local_dir, ticker,dud)
+              dud = cls._prices(wait_on_failure, local_dir, ticker,dud,incremental)
               time.sleep(wait_on_success)
           size = len(ticker_list) - len(dud)
           logging.info("Total {}".format(size))
@@ -60,12 +64,20 @@ class LOAD() :
           return dud
       @classmethod
       @trace
-      def robust(cls,data_store, wait_on_success, wait_on_failure, ticker_list) :
-          retry = cls.prices(data_store, wait_on_success, wait_on_failure, ticker_list)
+      def robust(cls,data_store, wait_on_success, wait_on_failure, ticker_list, incremental=False) :
+          retry = cls.prices(data_store, wait_on_success, wait_on_failure, ticker_list, incremental)
           if len(retry) > 0 :
-             retry = cls.prices(data_store, wait_on_success, wait_on_failure, retry)
+             retry = cls.prices(data_store, wait_on_success, wait_on_failure, retry, incremental)
           if len(retry) > 0 :
              logging.error((len(retry), sorted(retry)))
+          STOCK_TIMESERIES.manifest(data_store)
+      @classmethod
+      @trace
+      def consolidate(cls, price_store, *data_store_list) :
+          file_list = map(lambda data_store : '{}/*pkl'.format(data_store), data_store_list)
+          file_list = map(lambda path : ENVIRONMENT.find(path), file_list)
+          file_list = [ filename for path_list in file_list for filename in path_list ]
+          STOCK_TIMESERIES.consolidate(price_store, file_list)
 
 def get_tickers() :
     nasdaq = NASDAQ.init()
@@ -85,12 +97,15 @@ def get_tickers() :
 @trace
 def main() : 
     fund_list,stock_list, etf_list, alias = get_tickers()
+    STOCK_TIMESERIES.compact = VARIABLES().compact
 
     wait_on_success = VARIABLES().wait_on_success
     wait_on_failure = VARIABLES().wait_on_failure
-    LOAD.robust(VARIABLES().data_store_stock, wait_on_success, wait_on_failure, stock_list)
-    LOAD.robust(VARIABLES().data_store_stock, wait_on_success, wait_on_failure, etf_list)
-    LOAD.robust(VARIABLES().data_store_fund,  wait_on_success, wait_on_failure, fund_list)
+    incremental = VARIABLES().incremental
+    LOAD.robust(VARIABLES().data_store_stock, wait_on_success, wait_on_failure, stock_list, incremental)
+    LOAD.robust(VARIABLES().data_store_stock, wait_on_success, wait_on_failure, etf_list, incremental)
+    LOAD.robust(VARIABLES().data_store_fund,  wait_on_success, wait_on_failure, fund_list, incremental)
+    LOAD.consolidate(VARIABLES().price_store, VARIABLES().data_store_stock, VARIABLES().data_store_fund)
 
 if __name__ == '__main__' :
    import sys
@@ -105,7 +120,12 @@ if __name__ == '__main__' :
 
    data_store_stock = '{}/local/historical_prices'.format(env.pwd_parent)
    data_store_fund = '{}/local/historical_prices_fund'.format(env.pwd_parent)
+   price_store = '{}/local/price_store'.format(env.pwd_parent)
    wait_on_success=0.1
    wait_on_failure=1
+   # only fetch the days missing since the last run, full fetch on restatement
+   incremental=True
+   # float32 prices, ticker saved once per file instead of once per row
+   compact=False
    main()
 
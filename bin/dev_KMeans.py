@@ -11,16 +11,18 @@ import numpy as np
 from libCommon import INI_READ, INI_WRITE
 from libUtils import combinations, exit_on_exception, log_on_exception
 from libFinance import STOCK_TIMESERIES, HELPER as FINANCE
+from libStore import PRICE_STORE, CALENDAR
 from newSharpe import PORTFOLIO
 from libDebug import trace, cpu
 
 class EXTRACT() :
     _singleton = None
     _background_cache = None
+    _lookup_cache = None
     _prices = 'Adj Close'
     _floats_in_summary = ['CAGR', 'GROWTH', 'LEN', 'RISK', 'SHARPE']
 
-    def __init__(self, _env, local_dir, sector,background, benchmark, config_list, input_file, output_file,file_list) :
+    def __init__(self, _env, local_dir, sector,background, benchmark, config_list, input_file, output_file,file_list,price_store=None) :
         self._env = _env
         self.local_dir = local_dir
         self.sector = sector
@@ -30,6 +32,9 @@ class EXTRACT() :
         self.input_file = input_file
         self.output_file = output_file
         self.file_list = file_list
+        self.price_store = None
+        if PRICE_STORE.exists(price_store) :
+           self.price_store = PRICE_STORE.open(price_store)
         msg = vars(self)
         for i, key in enumerate(sorted(msg)) :
             value = msg[key]
@@ -56,6 +61,8 @@ class EXTRACT() :
         target = 'file_list'
         prices = globals().get(target,[])
         prices = list(prices)
+        target = 'price_store'
+        price_store = globals().get(target,None)
 
         input_file = None
         if len(_env.argv) > 0 :
@@ -67,7 +74,7 @@ class EXTRACT() :
         config_list = globals().get(target,[])
         if not isinstance(config_list,list) :
            config_list = list(config_list)
-        cls._singleton = cls(_env,local_dir,sector,bg,bm,config_list,input_file, output_file, prices)
+        cls._singleton = cls(_env,local_dir,sector,bg,bm,config_list,input_file, output_file, prices, price_store)
         return cls._singleton
     @classmethod
     def background(cls) :
@@ -115,12 +122,9 @@ class EXTRACT() :
     @classmethod
     @log_on_exception
     def prices(cls, ticker) :
-        data_store = cls.instance().file_list
-        suffix = '/{}.pkl'.format(ticker)
-        filename = filter(lambda x : x.endswith(suffix), data_store)
-        filename = list(filename)
-        if len(filename) > 0 :
-           filename = filename[0]
+        if cls._lookup_cache is None :
+           cls._lookup_cache = STOCK_TIMESERIES.lookup(cls.instance().file_list)
+        filename = cls._lookup_cache.get(ticker,None)
         logging.info((filename,ticker))
         name, ret = STOCK_TIMESERIES.load(filename)
         ret =  ret[cls._prices]
@@ -130,11 +134,16 @@ class EXTRACT() :
     @classmethod
     @log_on_exception
     def portfolio(cls, ticker_list) :
-        prices = map(lambda x : cls.prices(x), ticker_list)
-        prices = dict(zip(ticker_list,prices))
+        store = cls.instance().price_store
+        if not (store is None) and all(map(lambda x : x in store, ticker_list)) :
+           prices = store.read(cls._prices, ticker_list)
+           prices = prices.dropna(how='all')
+           prices = prices.to_dict('series')
+        else :
+           prices = map(lambda x : cls.prices(x), ticker_list)
+           prices = dict(zip(ticker_list,prices))
         logging.debug(prices.values())
-        prices = pd.DataFrame(prices)
-        prices.fillna(method='bfill', inplace=True)
+        prices = CALENDAR.instance().align(prices, fill='bfill', head='bfill')
         return prices
 
 class TRANSFORM():
@@ -197,19 +206,19 @@ class TRANSFORM_PORTFOLIO() :
                break
     @classmethod
     @trace
-    def portfolio(cls, prices, stocks, ret = None) :
+    def portfolio(cls, prices, stocks, ret = None, seed = None) :
         if ret is None :
            ret = pd.DataFrame()
-        max_sharpe, min_dev = PORTFOLIO.find(prices, stocks=stocks, portfolios=10000, period=FINANCE.YEAR)
+        max_sharpe, min_dev = PORTFOLIO.find(prices, stocks=stocks, portfolios=10000, period=FINANCE.YEAR, seed=seed)
         ret = ret.append(max_sharpe)
         ret = ret.append(min_dev)
         return ret
     @classmethod
     @trace
-    def getList(cls, data, prices) :
+    def getList(cls, data, prices, seed=None) :
         ret = pd.DataFrame()
-        for stock_list in cls.stocks(data) :
-            ret = cls.portfolio(prices,stock_list,ret)
+        for stock_list, child in zip(cls.stocks(data), PORTFOLIO.seeds(seed)) :
+            ret = cls.portfolio(prices,stock_list,ret,child)
             ret = cls.truncate(ret)
         if len(ret) > 5 :
            #min_risk = ret.sort_values(['risk']).head(5)
@@ -406,6 +415,7 @@ if __name__ == '__main__' :
    background = filter(lambda x : 'stock_' in x or 'fund_' in x, background)
    benchmark = filter(lambda x : 'benchmark' in x, ini_list)
    file_list = env.list_filenames('local/historical_*/*pkl')
+   price_store = '{}/price_store'.format(local_dir)
 
    main()
    # Execution speed for main : hours : 4.0, minutes : 7.0, seconds : 48.5
@@ -2,9 +2,11 @@
 
 import os
 import logging
+from functools import partial
 import pandas as pd
-from libUtils import ENVIRONMENT, exit_on_exception, log_on_exception
-from libFinance import STOCK_TIMESERIES, TRANSFORM_BACKGROUND
+from libUtils import ENVIRONMENT, exit_on_exception, log_on_exception, prefetch
+from libFinance import STOCK_TIMESERIES
+from libMetrics import BACKGROUND, ONLINE
 from libDebug import trace
 
 class EXTRACT_TICKER() :
@@ -15,21 +17,30 @@ class EXTRACT_TICKER() :
              cls.reader = STOCK_TIMESERIES.init()
           return cls.reader.extract_from_yahoo(ticker)
       @classmethod
-      def save(cls, local_dir, ticker,dud = None) :
+      def refresh(cls, filename, ticker) :
+          if cls.reader is None :
+             cls.reader = STOCK_TIMESERIES.init()
+          return cls.reader.refresh(filename, ticker)
+      @classmethod
+      def save(cls, local_dir, ticker,dud = None, incremental = False) :
           if dud is None :
              dud = []
-          data = cls.read(ticker)
+          filename = '{}/{}.pkl'.format(local_dir,ticker)
+          if incremental :
+             data = cls.refresh(filename, ticker)
+          else :
+             data = cls.read(ticker)
           if data is None :
              dud.append(ticker)
              return dud
-          filename = '{}/{}.pkl'.format(local_dir,ticker)
-          STOCK_TIMESERIES.save(filename, ticker, data)
+          if not incremental :
+             STOCK_TIMESERIES.save(filename, ticker, data)
           return dud
       @classmethod
-      def save_list(cls,local_dir, ticker_list) :
+      def save_list(cls,local_dir, ticker_list, incremental = False) :
           dud = None
           for ticker in ticker_list :
-              dud = cls.save(local_dir, ticker,dud)
+              dud = cls.save(local_dir, ticker,dud,incremental)
           size = len(ticker_list) - len(dud)
           logging.info("Total {}".format(size))
           if len(dud) > 0 :
@@ -46,10 +57,32 @@ class EXTRACT_TICKER() :
           #   return data
           name, data = STOCK_TIMESERIES.load(filename)
           if ticker == name :
+             returns = STOCK_TIMESERIES.load_returns(filename)
+             if not (returns is None) :
+                data['daily'] = returns['daily']
              return data
           msg = '{} {}'.format(ticker,name)
           msg = 'ticker does not match between filename and file content {}'.format(msg)
           raise ValueError(msg)
+      @classmethod
+      def load_list(cls, data_store, ticker_list, workers=4, **kwargs) :
+          '''
+          Generator of (ticker, prices), the next files are read on a pool while the caller works
+          kwargs : read_ahead, ordered, processes (see libUtils.prefetch)
+          '''
+          func = partial(cls.load, data_store)
+          for ticker, data in prefetch(func, ticker_list, workers, **kwargs) :
+              yield ticker, data
+      @classmethod
+      def metrics(cls, data_store, ticker_list, workers=4, incremental=False, **kwargs) :
+          '''
+          Generator of (ticker, dict), the metrics of TRANSFORM_BACKGROUND.find
+          incremental : advance the ONLINE state saved in data_store, only the days since the last run are read
+          kwargs : risk_free_rate, period, span
+          '''
+          if incremental :
+             return ONLINE.stream(data_store, ticker_list, **kwargs)
+          return BACKGROUND.stream(cls.load_list(data_store, ticker_list, workers), **kwargs)
 
 class TRANSFORM_TICKER() :
     _prices = 'Adj Close'
@@ -74,11 +107,14 @@ def load(**kwargs) :
     data_store = kwargs.get(target,"")
     target = 'ticker_list'
     ticker_list = kwargs.get(target,[])
-    retry = EXTRACT_TICKER.save_list(data_store, ticker_list)
+    target = 'incremental'
+    incremental = kwargs.get(target,False)
+    retry = EXTRACT_TICKER.save_list(data_store, ticker_list, incremental)
     if len(retry) > 0 :
-       retry = EXTRACT_TICKER.save_list(data_store, retry)
+       retry = EXTRACT_TICKER.save_list(data_store, retry, incremental)
     if len(retry) > 0 :
        logging.error((len(retry), sorted(retry)))
+    STOCK_TIMESERIES.manifest(data_store)
 
 @trace
 def main(**kwargs) :
@@ -86,10 +122,14 @@ def main(**kwargs) :
     data_store = kwargs.get(target,"")
     target = 'ticker_list'
     ticker_list = kwargs.get(target,[])
+    target = 'workers'
+    workers = kwargs.get(target,4)
+    target = 'incremental'
+    incremental = kwargs.get(target,False)
     ret = {}
-    for i, ticker in enumerate(ticker_list) :
-        prices = EXTRACT_TICKER.load(data_store, ticker)
-        ret[ticker] = TRANSFORM_BACKGROUND.find(prices)
+    data = EXTRACT_TICKER.metrics(data_store, ticker_list, workers, incremental)
+    for ticker, entry in data :
+        ret[ticker] = entry
     ret = pd.DataFrame(ret)
     logging.debug(ret)
     return ret
@@ -118,7 +158,7 @@ if __name__ == '__main__' :
    ticker_list = ['^GSPC','AAPL','RAFGX','SPY']
    ticker_list = ['AAPL','RAFGX','SPY']
    ticker_list = ['SPY','RAFGX','AAPL','^GSPC']
-   ret = main(data_store=data_store, ticker_list=ticker_list)
+   ret = main(data_store=data_store, ticker_list=ticker_list, incremental=True)
    logging.info(ret.loc[_XXX])
    logging.info(ret.T[_XXX])
 
@@ -1,17 +1,23 @@
+import os
 import sys
 import datetime
+import tempfile
+from functools import partial
 import logging
 import numpy as np
 import pandas as pd
 import pandas_datareader as web
 
-from libUtils import log_on_exception
+from libUtils import log_on_exception, prefetch
 from libDebug import trace, cpu
+from libStore import PRICE_STORE, MANIFEST, SHARED_MATRIX
 
 '''
   STOCK_SERIES - perhaps the only legit class in the entire library
               - defaults to pulling 10 years of stock data
               - Stock data saved as pkl files
+              - pkl files can be consolidated into a PRICE_STORE (see libStore)
+              - refresh appends only the missing days to a saved ticker
 
 Metric 
 Start Balance	$10,000	$10,000
@@ -95,63 +101,325 @@ class STOCK_TIMESERIES :
       def _extract_from(self, stock, service) :
           return web.DataReader(stock, service, self.start, self.end) 
 
+      overlap = 5
+      def refresh(self, filename, stock) :
+          '''
+          Incremental update of a saved ticker
+            - fetch only the days after the last stored date (re-fetching a few stored days as overlap)
+            - append and save
+            - full fetch when nothing is stored or the overlap no longer matches (split or dividend restatement)
+          returns None when yahoo returns nothing
+          '''
+          if not os.path.exists(filename) :
+             return self._refresh_full(filename, stock)
+          name, data = self.load(filename)
+          if data is None or len(data) == 0 :
+             return self._refresh_full(filename, stock)
+          data = data.sort_index()
+          last = data.index[-1]
+          missing = pd.bdate_range(last + datetime.timedelta(days=1), self.end)
+          if len(missing) == 0 :
+             logging.debug('{} up to date {}'.format(stock, last))
+             return data
+          start = data.index[-self.overlap:][0]
+          delta = type(self)(start, self.end).extract_from_yahoo(stock)
+          if delta is None :
+             return None
+          if self.restated(data, delta) :
+             logging.info('{} history restated, full refresh'.format(stock))
+             return self._refresh_full(filename, stock)
+          delta = delta[delta.index > last]
+          if len(delta) == 0 :
+             return data
+          ret = pd.concat([data, delta], sort=False)
+          ret = ret[ret.index >= self.start]
+          logging.debug('{} appended {} days'.format(stock, len(delta)))
+          self.save(filename, stock, ret)
+          return ret
+      def _refresh_full(self, filename, stock) :
+          ret = self.extract_from_yahoo(stock)
+          self.save(filename, stock, ret)
+          return ret
       @classmethod
-      def save(cls, filename, stock, data) :
+      def restated(cls, data, delta, target='Adj Close') :
+          if target not in data or target not in delta :
+             target = 'Close'
+          index = data.index.intersection(delta.index)
+          if len(index) == 0 :
+             return True
+          old = data.loc[index, target].values.astype(np.float64)
+          new = delta.loc[index, target].values.astype(np.float64)
+          return not np.allclose(old, new, rtol=1e-4, equal_nan=True)
+
+      '''
+      compact     - float32 prices, integer volume, ticker kept once in data.attrs
+      compression - gzip|bz2|xz|zip, load detects it from the file itself
+      '''
+      compact = False
+      compression = None
+      _magic = { b'\x1f\x8b' : 'gzip', b'BZh' : 'bz2', b'\xfd7zXZ' : 'xz', b'PK' : 'zip' }
+      @classmethod
+      def save(cls, filename, stock, data, compact=None, compression=None) :
           if data is None : return
-          data['Stock'] = stock
-          data.to_pickle(filename)
+          if compact is None : compact = cls.compact
+          if compression is None : compression = cls.compression
+          returns = None
+          if cls.derive :
+             returns = cls.find_returns(data)
+          if compact :
+             data = cls.encode(stock, data)
+          else :
+             data['Stock'] = stock
+          data.to_pickle(filename, compression=compression)
+          MANIFEST.touch(filename)
+          if not (returns is None) :
+             cls.save_returns(filename, returns)
+      @classmethod
+      def encode(cls, stock, data) :
+          data = data.drop(columns=['Stock'], errors='ignore')
+          data.attrs['Stock'] = stock
+          for column in data.columns :
+              if not np.issubdtype(data[column].dtype, np.number) :
+                 continue
+              if column != 'Volume' :
+                 data[column] = data[column].astype(np.float32)
+              elif not data[column].isnull().any() :
+                 data[column] = data[column].astype(np.int64)
+          return data
+      @classmethod
+      def decode(cls, data) :
+          for column in data.columns :
+              if data[column].dtype == np.float32 :
+                 data[column] = data[column].astype(np.float64)
+          return data.attrs.get('Stock', None), data
+      @classmethod
+      def _compression(cls, filename) :
+          with open(filename, 'rb') as fp :
+               head = fp.read(6)
+          for magic, ret in cls._magic.items() :
+              if head.startswith(magic) :
+                 return ret
+          return None
 
       @classmethod
-      def load(cls, filename) :
-          data = pd.read_pickle(filename)
+      def load(cls, filename, start=None, end=None, columns=None) :
+          '''
+          start, end : keep the rows between them (both inclusive)
+          columns : keep only these columns
+          '''
+          data = pd.read_pickle(filename, compression=cls._compression(filename))
           target = 'Stock'
           if target in data :
              name = data.pop(target)
              name = name[0]
+             return name, cls.window(data, start, end, columns)
+          name, data = cls.decode(data)
+          data = cls.window(data, start, end, columns)
+          if not (name is None) :
              return name, data
           name = filename.split("/")[-1]
           name = name.split(".")[0]
           return name, data
       @classmethod
-      def bulk(cls, file_list ) :
-          for i, path in enumerate(file_list) :
-              ticker, ret = cls.load(path)
+      def window(cls, data, start=None, end=None, columns=None) :
+          '''
+          rows are found by binary search on the (sorted) date index, not by a boolean mask
+          '''
+          if start is None and end is None and columns is None :
+             return data
+          if not data.index.is_monotonic_increasing :
+             data = data.sort_index()
+          lo, hi = PRICE_STORE.bounds(data.index, start, end)
+          data = data.iloc[lo:hi]
+          if columns is None :
+             return data
+          if isinstance(columns, str) :
+             columns = [columns]
+          columns = filter(lambda x : x in data, columns)
+          return data[list(columns)]
+      '''
+      derive - save daily and log returns next to the prices, <path>/returns/<ticker>.pkl
+               with the cumulative log return (log of price over first price) for growth between any two dates
+               they remember the size and mtime of the price file they came from
+               load_returns recomputes them when the price file has changed since
+      '''
+      derive = True
+      _returns_dir = 'returns'
+      @classmethod
+      def returns_filename(cls, filename) :
+          path, name = os.path.split(filename)
+          return '{}/{}/{}'.format(path, cls._returns_dir, name)
+      @classmethod
+      def find_returns(cls, data, target='Adj Close') :
+          if target not in data :
+             target = 'Close'
+          if target not in data :
+             return None
+          prices = data[target].dropna()
+          if len(prices) == 0 :
+             return None
+          daily = TRANSFORM_DAILY.find(prices)
+          ret = pd.DataFrame({'daily' : daily, 'log' : np.log1p(daily)}, index=prices.index)
+          ret['cumulative'] = np.log(prices / prices.iloc[0])
+          return ret
+      @classmethod
+      def _source(cls, filename) :
+          stat = os.stat(filename)
+          return [stat.st_size, stat.st_mtime_ns]
+      @classmethod
+      def save_returns(cls, filename, returns) :
+          '''
+          safe from several threads, each writes its own temporary file and renames it into place
+          '''
+          target = cls.returns_filename(filename)
+          path = os.path.dirname(target)
+          os.makedirs(path, exist_ok=True)
+          returns.attrs['source'] = cls._source(filename)
+          fd, temp = tempfile.mkstemp(dir=path, suffix='.tmp')
+          os.close(fd)
+          try :
+             returns.to_pickle(temp)
+             os.replace(temp, target)
+          except :
+             os.remove(temp)
+             raise
+          return returns
+      @classmethod
+      def load_returns(cls, filename) :
+          '''
+          daily and log returns of a saved ticker, indexed like its prices (the first day is NaN)
+          '''
+          target = cls.returns_filename(filename)
+          if os.path.exists(target) :
+             ret = pd.read_pickle(target)
+             if ret.attrs.get('source', None) == cls._source(filename) :
+                return ret
+             logging.debug('{} is stale'.format(target))
+          name, data = cls.load(filename)
+          ret = cls.find_returns(data)
+          if ret is None :
+             return ret
+          return cls.save_returns(filename, ret)
+      @classmethod
+      def bulk(cls, file_list, workers=0, start=None, end=None, columns=None, **kwargs) :
+          '''
+          workers > 0 decodes upcoming files on a pool while the caller works on the current one
+          start, end, columns : see load
+          kwargs : read_ahead, ordered, processes (see libUtils.prefetch)
+          '''
+          func = partial(cls.load, start=start, end=end, columns=columns)
+          for path, ret in prefetch(func, file_list, workers, **kwargs) :
+              ticker, ret = ret
               yield ticker, ret 
       @classmethod
-      def read(cls, file_list, stock_list) :
+      def manifest(cls, path) :
+          return MANIFEST.open(path, cls.load)
+      @classmethod
+      def lookup(cls, file_list) :
+          '''
+          ticker -> filename, via the manifest of each directory in file_list
+          '''
+          return MANIFEST.lookup(file_list, cls.load)
+      @classmethod
+      def read(cls, file_list, stock_list, workers=0, **kwargs) :
           if not isinstance(stock_list,list) :
              stock_list = list(stock_list)
           if stock_list is None or len(stock_list) == 0 :
-             for i, path in enumerate(file_list) :
-                 name, ret = cls.load(path)
+             for name, ret in cls.bulk(file_list, workers, **kwargs) :
                  yield name, ret
              return
-              
-          for i, path in enumerate(file_list) :
-              flag = filter(lambda x : x in path, stock_list)
-              flag = list(flag)
-              flag = len(flag) > 0
-              if not flag : continue
-              name, ret = cls.load(path)
-              if name not in stock_list :
-                 del ret
-                 continue
+
+          file_list = list(file_list)
+          position = dict(zip(file_list, range(len(file_list))))
+          lookup = cls.lookup(file_list)
+          path_list = filter(lambda x : x in lookup, stock_list)
+          path_list = map(lambda x : lookup[x], path_list)
+          path_list = sorted(set(path_list), key=lambda x : position[x])
+          for name, ret in cls.bulk(path_list, workers, **kwargs) :
               yield name, ret
       @classmethod
-      def read_all(cls, file_list, stock_list) :
+      def read_all(cls, file_list, stock_list, columns=None, workers=0, start=None, end=None) :
+          '''
+          columns : None keeps every (ticker, column) pair
+                    'Adj Close' returns a flat (dates x tickers) frame
+          '''
+          data = cls.read(file_list, stock_list, workers, start=start, end=end, columns=columns)
+          return cls.panel(data, columns)
+      @classmethod
+      def panel(cls, data, columns=None) :
+          '''
+          Collect every series first, then align them in one pass onto the union of all dates
+          '''
+          flat = isinstance(columns, str)
+          if flat :
+             columns = [columns]
+          grow = columns is None
+          columns = [] if grow else list(columns)
           name_list = []
-          data = None
-          for stock_name, stock_data in cls.read(file_list, stock_list) :
+          index_list = []
+          value_list = []
+          for stock_name, stock_data in data :
              try :
+               column_list = columns
+               if grow :
+                  column_list = columns + list(filter(lambda x : x not in columns, stock_data.columns))
+               stock_data = stock_data.reindex(columns=column_list)
+               values = stock_data.values.astype(np.float64)
+               # nothing is kept until the ticker converts, the lists stay in step
+               columns = column_list
                name_list.append(stock_name)
-               stock_data.columns = pd.MultiIndex.from_product([[stock_name], stock_data.columns])
-               if data is None:
-                  data = stock_data
-               else:
-                  data = pd.concat([data, stock_data], axis=1)
+               index_list.append(stock_data.index.values)
+               value_list.append(values)
              except Exception as e :  logging.error(e, exc_info=True)
              finally : pass
-          return name_list, data
+          if len(name_list) == 0 :
+             return name_list, None
+          index = np.unique(np.concatenate(index_list))
+          width = len(columns)
+          ret = np.full((len(index), width * len(name_list)), np.nan)
+          for i, values in enumerate(value_list) :
+              row = index.searchsorted(index_list[i])
+              ret[row, i*width:i*width + values.shape[1]] = values
+          index = pd.DatetimeIndex(index, name='Date')
+          if flat :
+             return name_list, pd.DataFrame(ret, index=index, columns=name_list)
+          columns = pd.MultiIndex.from_product([name_list, columns])
+          return name_list, pd.DataFrame(ret, index=index, columns=columns)
+      @classmethod
+      def share(cls, file_list, stock_list, target='Adj Close', workers=0) :
+          '''
+          Load the aligned prices once and place them, with their daily returns, in shared memory
+          Hand prices.spec / returns.spec to pool workers, they SHARED_MATRIX.attach them
+          The caller owns both blocks and must unlink them
+          '''
+          name_list, prices = cls.read_all(file_list, stock_list, target, workers)
+          if prices is None :
+             return None, None
+          returns = TRANSFORM_DAILY.find(prices)
+          return SHARED_MATRIX.create(prices), SHARED_MATRIX.create(returns)
+      @classmethod
+      def consolidate(cls, path, file_list, fields=None, dtype=None, frequency_list=None) :
+          '''
+          frequency_list : derived stores rebuilt with it, every HELPER.FREQUENCY by default, [] for none
+          '''
+          ret = PRICE_STORE.build(path, cls.bulk(file_list), fields, dtype)
+          logging.info(str(ret))
+          name, field = PRICE_STORE._returns
+          if field in ret.fields :
+             cls.resample(ret, frequency_list, dtype)
+          return ret
+      @classmethod
+      def resample(cls, store, frequency_list=None, dtype=None) :
+          '''
+          weekly, monthly, quarterly closes and returns of a PRICE_STORE, see PRICE_STORE.resample
+          '''
+          if frequency_list is None :
+             frequency_list = sorted(HELPER.FREQUENCY)
+          ret = {}
+          for frequency in frequency_list :
+              rule, year = HELPER.FREQUENCY[frequency]
+              ret[frequency] = store.resample(frequency, rule, dtype)
+          return ret
       @classmethod
       def flatten(cls, target,d) :
           d = d.iloc[:, d.columns.get_level_values(1)==target]
@@ -168,9 +436,21 @@ class HELPER :
       QUARTER = 63
       MONTH = 21
       WEEK = 5
-      RESAMPLE_YEAR = '12M'
-      RESAMPLE_QUARTER = '3M'
+      RESAMPLE_YEAR = 'A'
+      RESAMPLE_QUARTER = 'Q'
       RESAMPLE_MONTH = 'M'
+      RESAMPLE_WEEK = 'W-FRI'
+      # frequency : resample rule, rows a year
+      FREQUENCY = { 'weekly' : (RESAMPLE_WEEK, 52), 'monthly' : (RESAMPLE_MONTH, 12), 'quarterly' : (RESAMPLE_QUARTER, 4) }
+
+      @classmethod
+      def periods(cls, frequency='daily') :
+          '''
+          rows a year, the period of sharpe and risk and the CAGR year of prices at that frequency
+          '''
+          if frequency in cls.FREQUENCY :
+             return cls.FREQUENCY[frequency][1]
+          return cls.YEAR
 
       @classmethod
       def get_height(cls, data) :
@@ -220,8 +500,10 @@ class HELPER :
              risk = data.std()
              return risk, returns
           #weigth recent history more heavily that older history
-          returns = data.ewm(span=span).mean().iloc[-1]
-          risk = data.ewm(span=span).std().iloc[-1]
+          #libMetrics.SWEEP for several spans or tickers at once
+          ewm = data.ewm(span=span)
+          returns = ewm.mean().iloc[-1]
+          risk = ewm.std().iloc[-1]
           return risk, returns
 # TODO add  5 3 1 year cagr calcilations
 class TRANSFORM_CAGR() :
@@ -251,9 +533,13 @@ class TRANSFORM_CAGR() :
 class TRANSFORM_CAGR_SEGMENTS() :
       _interval = [8,5,3,1]
       _columns = [ 'CAGR {}'.format(i) for i in _interval ]
+      _index = 'cumulative'
       @classmethod
       def enrich(cls, data, stock=None, summary = None):
-          values = [ cls.transform(data,i) for i in cls._interval]
+          if isinstance(data, pd.Series) or cls._index in data :
+             values = cls.find(data)
+          else :
+             values = [ cls.transform(data,i) for i in cls._interval]
           ret = dict(zip(cls._columns,values))
           ret = pd.DataFrame(ret, index=[stock])
           if summary is None :
@@ -261,6 +547,30 @@ class TRANSFORM_CAGR_SEGMENTS() :
           ret = ret.append(summary)
           return ret
       @classmethod
+      def find(cls, data, interval=None) :
+          '''
+          data : prices, or the returns of STOCK_TIMESERIES.load_returns
+          the cumulative log index of the returns is read as stored, two lookups a horizon
+          prices are logged first, one pass over the history
+          growth is the difference of two entries of the log index
+          '''
+          if interval is None :
+             interval = cls._interval
+          if isinstance(data, pd.DataFrame) and cls._index in data :
+             values = data[cls._index].values
+          else :
+             values = data.dropna().values.astype(np.float64)
+             values = np.log(values)
+          ret = []
+          for duration in interval :
+              start = len(values) - HELPER.YEAR * duration
+              if start < 0 :
+                 ret.append(0)
+                 continue
+              growth = np.exp(values[-1] - values[start])
+              ret.append(round(float(growth ** (1 / float(duration)) - 1), 4))
+          return ret
+      @classmethod
       def transform(cls, data, duration_in_years=1):
           years = HELPER.YEAR * duration_in_years
           _data = data.dropna(how='all')
@@ -288,16 +598,14 @@ class TRANSFORM_DRAWDOWN() :
       @classmethod
       def validate(cls, data):
           ret = data.dropna(how='all')
-          ret = ret.pct_change()
           return ret
       @classmethod
       def find(cls, ret):
           peak = ret.cummax()
-          trough = ret.cumsum()
+          trough = ret.cummin()
           logging.debug(peak)
           logging.debug(trough)
-          ret = trough - peak
-          values = [ ret.min(), ret.max() ]
+          values = [ (ret / peak - 1).min(), (ret / trough - 1).max() ]
           ret =  dict(zip(cls.key_list, values))
           logging.debug(ret)
           return ret
@@ -358,13 +666,14 @@ class TRANSFORM_SHARPE :
           ret = ret.append(summary)
           return ret
       @classmethod
-      def find(cls, data, risk_free_rate, period, span, size) :
+      def find(cls, data, risk_free_rate, period, span, size, daily=None) :
           flag_1 = data is None
           flag_2 = len(data) == 0
           if flag_1 or flag_2 :
              ret =  dict(zip(cls.key_list, [0, 0, 0, size]))
              return ret
-          daily = TRANSFORM_DAILY.find(data)
+          if daily is None :
+             daily = TRANSFORM_DAILY.find(data)
           flag_1 = daily is None
           flag_2 = len(daily) == 0
           if flag_1 or flag_2 :
@@ -385,11 +694,11 @@ class TRANSFORM_SHARPE :
              risk = data.std()
              return risk, returns
           #weigth recent history more heavily that older history
-          returns = data.ewm(span=span).mean().iloc[-1]
-          risk = data.ewm(span=span).std().iloc[-1]
+          #libMetrics.SWEEP for several spans or tickers at once
+          ewm = data.ewm(span=span)
+          returns = ewm.mean().iloc[-1]
+          risk = ewm.std().iloc[-1]
           return risk, returns
-          rolling = returns_s.rolling(window=self.periods)
-          rolling_sharpe_s = np.sqrt(self.periods) * (rolling.mean() / rolling.std())
       @classmethod
       def annualize(cls, risk, returns, period) :
           if isinstance(returns,pd.Series) : returns = returns[0]
@@ -404,7 +713,7 @@ class TRANSFORM_SHARPE :
              ret = ( returns - risk_free_rate ) / risk
           return ret
       @classmethod
-      def validate(cls, data, **kwargs) :
+      def parameters(cls, **kwargs) :
           target = "period"
           period = kwargs.get(target,1)
           target = "risk_free_rate"
@@ -421,6 +730,10 @@ class TRANSFORM_SHARPE :
           if risk_free_rate < 0 :
              logging.warn("risk_free_rate must be positive")
              risk_free_rate = 0
+          return risk_free_rate, period, span
+      @classmethod
+      def validate(cls, data, **kwargs) :
+          risk_free_rate, period, span = cls.parameters(**kwargs)
           if not isinstance(data,pd.DataFrame) :
              logging.warning("prices are not in a dataframe {}".format(type(data)))
              data = pd.DataFrame(data)
@@ -434,7 +747,7 @@ class TRANSFORM_BACKGROUND() :
     _prices = 'Adj Close'
     _daily = 'daily'
     '''
-       .06 seconds per call
+       .06 seconds per call, per ticker timings of every transform : test/bench_Finance.py
     '''
     @classmethod
     def enrich(cls, data, stock, summary, **kwargs) :
@@ -452,26 +765,94 @@ class TRANSFORM_BACKGROUND() :
            ret = ret.append(summary)
         return ret
     '''
-       .04 seconds per call
+       fused kernel, one dropna and one set of numpy operations on the price array
+       same dict as alt_find, about .1 ms per call against 3 ms (test/bench_Finance.py)
     '''
+    key_list = TRANSFORM_SHARPE.key_list + TRANSFORM_CAGR.key_list + TRANSFORM_DRAWDOWN.key_list
     @classmethod
     def find(cls, data, **kwargs) :
+        if data is None :
+           return {}
+        prices = data[cls._prices]
+        size = len(prices)
+        values = prices.values.astype(np.float64)
+        values = values[np.isfinite(values)]
+        daily = None
+        if cls._daily in data :
+           daily = data[cls._daily].values.astype(np.float64)
+           daily = daily[np.isfinite(daily)]
+        risk_free_rate, period, span = TRANSFORM_SHARPE.parameters(**kwargs)
+        ret = cls.kernel(values, risk_free_rate, period, span, size, daily)
+        logging.debug(ret)
+        return ret
+    @classmethod
+    def kernel(cls, values, risk_free_rate, period, span, size, daily=None) :
+        '''
+        values : valid prices, oldest first
+        daily : their daily returns, derived from values when missing
+        '''
+        n = len(values)
+        if daily is None :
+           daily = values[1:] / values[:-1] - 1
+        m = len(daily)
+        returns, risk, sharpe = 0, 0, 0
+        if m > 0 and size >= period :
+           weights = np.ones(m)
+           if span > 0 :
+              weights = (1 - 2.0 / (span + 1)) ** np.arange(m - 1, -1, -1)
+           total = weights.sum()
+           returns = weights.dot(daily) / total
+           risk = np.nan
+           if m > 1 :
+              square = weights.dot(weights)
+              var = weights.dot((daily - returns) ** 2) / total
+              risk = np.sqrt(var * total ** 2 / (total ** 2 - square))
+           returns *= period
+           risk *= np.sqrt(period)
+           sharpe = TRANSFORM_SHARPE.sharpe(risk, returns, risk_free_rate)
+        growth, cagr = np.nan, np.nan
+        if n > 0 :
+           growth = values[-1] / values[0]
+           cagr = growth ** (1 / (n / float(HELPER.YEAR))) - 1
+        low, high = np.nan, np.nan
+        if n > 0 :
+           low = (values / np.maximum.accumulate(values)).min() - 1
+           high = (values / np.minimum.accumulate(values)).max() - 1
+        values = [ round(float(x),4) for x in [returns, risk, sharpe] ]
+        values += [ size ]
+        values += [ round(float(x),4) for x in [cagr, growth] ]
+        values += [ float(low), float(high) ]
+        return dict(zip(cls.key_list, values))
+    '''
+       .04 seconds per call, now about 3 ms (test/bench_Finance.py)
+    '''
+    @classmethod
+    def alt_find(cls, data, **kwargs) :
+        '''
+        daily returns are computed once for SHARPE
+        a 'daily' column (see STOCK_TIMESERIES.load_returns) is used as is
+        '''
         if data is None :
            return {}
 
         prices = data[cls._prices]
+        daily = cls.daily(data, prices)
         data, risk_free_rate, period, span, size = TRANSFORM_SHARPE.validate(prices,**kwargs)
-        sharpe = TRANSFORM_SHARPE.find(data, risk_free_rate, period, span, size)
+        sharpe = TRANSFORM_SHARPE.find(data, risk_free_rate, period, span, size, daily)
         growth, periods = TRANSFORM_CAGR.validate(prices)
         cagr = TRANSFORM_CAGR.find(growth, periods)
-        ret = TRANSFORM_DRAWDOWN.validate(prices)
-        drawdown = TRANSFORM_DRAWDOWN.find(ret)
+        drawdown = TRANSFORM_DRAWDOWN.find(prices.dropna())
 
         ret = {}
         ret.update(sharpe)
         ret.update(cagr)
         ret.update(drawdown)
         return ret
+    @classmethod
+    def daily(cls, data, prices) :
+        if cls._daily in data :
+           return data[cls._daily].dropna()
+        return TRANSFORM_DAILY.find(prices.dropna())
 '''
 #	Asset	                        CAGR	Expected Return*	Standard Deviation	Sharpe Ratio*	Min. Weight	Max. Weight
 1	Apple Inc. (AAPL)	        22.03%	34.34%	                43.73%	                0.713	        0.00%	100.00%
@@ -521,7 +902,7 @@ if __name__ == "__main__" :
            msg = dict(zip(['returns','risk','sharpe'],msg))
            logging.debug(msg)
            logging.debug (TRANSFORM_CAGR.find(ret['Adj Close']))
-           logging.debug (TRANSFORM_DRAWDOWN.find(daily['Adj Close']))
+           logging.debug (TRANSFORM_DRAWDOWN.find(ret['Adj Close']))
 
    def demo_stock_2() :
        a,b = STOCK_TIMESERIES.read_all(file_list, stock_list)
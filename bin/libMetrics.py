@@ -0,0 +1,793 @@
+import json
+import logging
+import os
+import tempfile
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+from libFinance import HELPER, STOCK_TIMESERIES, TRANSFORM_SHARPE, TRANSFORM_BACKGROUND, TRANSFORM_CAGR_SEGMENTS
+from libStore import PRICE_STORE, CALENDAR
+
+'''
+  BACKGROUND - TRANSFORM_BACKGROUND.find for every column of a (dates x tickers) price matrix at once
+             - each ticker runs from its own first to its last valid price, gaps are skipped like dropna does
+             - stream() measures the (ticker, prices) pairs of EXTRACT_TICKER.load_list one at a time with the fused kernel
+
+  DRAWDOWN - max drawdown of every column against its running peak price, with its dates, duration and time under water
+
+  SWEEP - final EWM mean and variance for a list of spans and every column in one pass over the daily returns
+
+  ROLLING - trailing window time series of the same metrics, O(T) for any window
+
+  RISK - downside, tail, benchmark relative and capture metrics for every column against a benchmark
+
+  GROWTH - growth and CAGR between any two dates from a cumulative log price index, O(1) a query
+
+  ONLINE - per ticker running state of the same metrics, appending a day costs O(1)
+'''
+
+class BACKGROUND() :
+      key_list = TRANSFORM_BACKGROUND.key_list
+      _prices = 'Adj Close'
+
+      @classmethod
+      def daily(cls, values, mask) :
+          '''
+          return from the previous valid price of the same ticker, NaN on its first
+          '''
+          return CALENDAR.returns(values, mask)
+      @classmethod
+      def weights(cls, mask, span) :
+          '''
+          ewm(span, adjust=True) weights, counted in each ticker's own observations back from its last one
+          '''
+          if span == 0 :
+             return mask.astype(np.float64)
+          alpha = 2.0 / (span + 1)
+          after = np.cumsum(mask[::-1], axis=0)[::-1] - mask
+          return np.where(mask, (1 - alpha) ** after, 0.0)
+      @classmethod
+      def moments(cls, daily, mask, span) :
+          '''
+          last value of ewm(span).mean() and the bias corrected ewm(span).std()
+          '''
+          weights = cls.weights(mask, span)
+          x = np.where(mask, daily, 0.0)
+          count = mask.sum(axis=0)
+          total = weights.sum(axis=0)
+          square = (weights * weights).sum(axis=0)
+          with np.errstate(divide='ignore', invalid='ignore') :
+               mean = (weights * x).sum(axis=0) / total
+               var = (weights * (x - mean) ** 2).sum(axis=0) / total
+               var *= total ** 2 / (total ** 2 - square)
+          risk = np.where(count > 1, np.sqrt(np.maximum(var, 0)), np.nan)
+          return risk, mean, count
+      @classmethod
+      def cagr(cls, values, mask, year=HELPER.YEAR) :
+          count = mask.sum(axis=0)
+          column = np.arange(values.shape[1])
+          first = CALENDAR.start(mask)
+          last = len(mask) - 1 - CALENDAR.start(mask[::-1])
+          with np.errstate(divide='ignore', invalid='ignore') :
+               growth = values[np.maximum(last, 0), column] / values[np.minimum(first, len(mask) - 1), column]
+               periods = count / float(year)
+               cagr = growth ** (1 / periods) - 1
+          growth = np.where(count > 0, growth, np.nan)
+          cagr = np.where(count > 0, cagr, np.nan)
+          return cagr, growth
+
+      @classmethod
+      def find(cls, prices, size=None, **kwargs) :
+          '''
+          prices : (dates x tickers) DataFrame e.g. STOCK_TIMESERIES.read_all(..., 'Adj Close')
+          size : LEN of each ticker, defaults to its count of valid prices, below period RETURNS, RISK, SHARPE are 0
+          year : rows a year for CAGR, HELPER.periods of the price frequency
+          returns ticker -> dict, the same dict as TRANSFORM_BACKGROUND.find
+          '''
+          risk_free_rate, period, span = TRANSFORM_SHARPE.parameters(**kwargs)
+          target = 'year'
+          year = kwargs.get(target, HELPER.YEAR)
+          name_list = list(prices.columns)
+          values = prices.values.astype(np.float64)
+          values[~np.isfinite(values)] = np.nan
+          mask = ~np.isnan(values)
+          if size is None :
+             size = mask.sum(axis=0)
+          size = np.asarray(size)
+
+          daily = cls.daily(values, mask)
+          daily_mask = ~np.isnan(daily)
+          risk, returns, count = cls.moments(daily, daily_mask, span)
+          returns = returns * period
+          risk = risk * np.sqrt(period)
+          with np.errstate(divide='ignore', invalid='ignore') :
+               sharpe = np.where(risk != 0, (returns - risk_free_rate) / risk, 0)
+          empty = (count == 0) | (size < period)
+          returns, risk, sharpe = [ np.where(empty, 0, x) for x in [returns, risk, sharpe] ]
+          cagr, growth = cls.cagr(values, mask, year)
+          low, high = DRAWDOWN.extremes(values, mask)
+
+          ret = {}
+          for i, name in enumerate(name_list) :
+              values = [ round(float(x[i]),4) for x in [returns, risk, sharpe] ]
+              values.append(int(size[i]))
+              values.extend([ round(float(x[i]),4) for x in [cagr, growth] ])
+              values.extend([ float(low[i]), float(high[i]) ])
+              ret[name] = dict(zip(cls.key_list, values))
+          return ret
+      @classmethod
+      def stream(cls, data, **kwargs) :
+          '''
+          data : iterable of (ticker, prices DataFrame) e.g. EXTRACT_TICKER.load_list
+          yields (ticker, dict) in the order of data
+          tickers that arrive one at a time go through the TRANSFORM_BACKGROUND.find kernel, with their 'daily' column when loaded
+          aligning them onto a shared calendar for find costs more than it saves (test/bench_Finance.py)
+          '''
+          for ticker, prices in data :
+              if prices is None or cls._prices not in prices :
+                 logging.warning('{} has no {}'.format(ticker, cls._prices))
+                 continue
+              yield ticker, TRANSFORM_BACKGROUND.find(prices, **kwargs)
+
+class DRAWDOWN() :
+      '''
+        MAX DRAWDOWN - lowest price against the highest price before it, minus 1
+        MAX INCREASE - highest price against the lowest price before it, minus 1
+        PEAK, TROUGH, RECOVERY - dates of the max drawdown, NaT when there is none or it has not recovered
+        DURATION - prices from PEAK to RECOVERY, or to the last price when still under water
+        UNDER WATER - share of prices below the highest price before them
+      '''
+      key_list = ['MAX DRAWDOWN', 'MAX INCREASE', 'PEAK', 'TROUGH', 'RECOVERY', 'DURATION', 'UNDER WATER']
+
+      @classmethod
+      def extremes(cls, values, mask) :
+          '''
+          MAX DRAWDOWN and MAX INCREASE of each column, NaN for a column without prices
+          '''
+          with np.errstate(divide='ignore', invalid='ignore') :
+               low = np.where(mask, values / np.fmax.accumulate(values, axis=0), np.inf).min(axis=0, initial=np.inf) - 1
+               high = np.where(mask, values / np.fmin.accumulate(values, axis=0), -np.inf).max(axis=0, initial=-np.inf) - 1
+          count = mask.sum(axis=0)
+          low = np.where(count > 0, low, np.nan)
+          high = np.where(count > 0, high, np.nan)
+          return low, high
+      @classmethod
+      def find(cls, prices) :
+          '''
+          prices : (dates x tickers) DataFrame, gaps are skipped
+          returns (tickers x key_list) DataFrame
+          '''
+          name_list = list(prices.columns)
+          values = prices.values.astype(np.float64)
+          values[~np.isfinite(values)] = np.nan
+          mask = ~np.isnan(values)
+          rows = np.arange(len(values))[:, None]
+          column = np.arange(values.shape[1])
+          count = mask.sum(axis=0)
+
+          peak = np.fmax.accumulate(values, axis=0)
+          with np.errstate(divide='ignore', invalid='ignore') :
+               underwater = np.where(mask, values / peak - 1, 0.0)
+          low, high = cls.extremes(values, mask)
+          drawn = count > 0
+          drawn[drawn] = low[drawn] < 0
+
+          trough = np.argmin(underwater, axis=0)
+          top = np.maximum.accumulate(np.where(mask & (values >= peak), rows, 0), axis=0)
+          top = top[trough, column]
+          after = mask & (rows > trough) & (values >= values[top, column])
+          recovered = drawn & after.any(axis=0)
+          recovery = np.argmax(after, axis=0)
+          last = len(mask) - 1 - CALENDAR.start(mask[::-1])
+          position = np.cumsum(mask, axis=0)
+          end = np.where(recovered, recovery, np.maximum(last, 0))
+          duration = np.where(drawn, position[end, column] - position[top, column], 0)
+          duration = np.where(count > 0, duration, np.nan)
+          with np.errstate(divide='ignore', invalid='ignore') :
+               under = (underwater < 0).sum(axis=0) / count
+
+          index = prices.index
+          ret = [ low, high
+                , index.take(top).where(drawn)
+                , index.take(trough).where(drawn)
+                , index.take(recovery).where(recovered)
+                , duration, under ]
+          ret = dict(zip(cls.key_list, ret))
+          return pd.DataFrame(ret, index=name_list, columns=cls.key_list)
+
+class SWEEP() :
+      '''
+        Final ewm(span, adjust=True) mean and variance of the daily returns of every column, for several spans at once
+        One pass over the rows, each row advances the state of every (span, ticker) pair with a vector of decay factors
+        Gaps are skipped, span 0 is the plain mean and std like TRANSFORM_SHARPE.extractRR
+      '''
+      key_list = ['RETURNS','RISK','SHARPE']
+
+      @classmethod
+      def decay(cls, span_list) :
+          span = np.asarray(span_list, dtype=np.float64)
+          return np.where(span > 0, 1 - 2.0 / (span + 1), 1.0)
+      @classmethod
+      def moments(cls, daily, mask, span_list) :
+          '''
+          daily, mask : (dates x tickers)
+          returns mean, bias corrected variance (NaN below 2 returns) and count, (spans x tickers) each
+          '''
+          decay = cls.decay(span_list)[:, None]
+          shape = (len(decay), daily.shape[1])
+          weight, weight2, mean, var = [ np.zeros(shape) for i in range(4) ]
+          with np.errstate(divide='ignore', invalid='ignore') :
+               for x, valid in zip(daily, mask) :
+                   x = np.where(valid, x, 0.0)
+                   prior = np.where(valid, weight * decay, weight)
+                   total = prior + valid
+                   update = np.where(valid, mean + (x - mean) / total, mean)
+                   var = np.where(valid, (prior * (var + (mean - update) ** 2) + (x - update) ** 2) / total, var)
+                   mean = update
+                   weight2 = np.where(valid, weight2 * decay * decay + 1, weight2)
+                   weight = total
+               var = var * weight ** 2 / (weight ** 2 - weight2)
+          count = mask.sum(axis=0)
+          var = np.where(count > 1, np.maximum(var, 0), np.nan)
+          return mean, var, count
+      @classmethod
+      def find(cls, prices, span_list=None, size=None, **kwargs) :
+          '''
+          prices : (dates x tickers) DataFrame
+          span_list : defaults to the span of TRANSFORM_SHARPE.parameters
+          size : LEN of each ticker, defaults to its count of valid prices, below period the metrics are 0
+          returns key -> (tickers x spans) DataFrame, the RETURNS, RISK and SHARPE of TRANSFORM_SHARPE.find
+          '''
+          risk_free_rate, period, span = TRANSFORM_SHARPE.parameters(**kwargs)
+          if span_list is None :
+             span_list = [span]
+          name_list = list(prices.columns)
+          values = prices.values.astype(np.float64)
+          values[~np.isfinite(values)] = np.nan
+          mask = ~np.isnan(values)
+          if size is None :
+             size = mask.sum(axis=0)
+          size = np.asarray(size)
+          daily = BACKGROUND.daily(values, mask)
+          returns, var, count = cls.moments(daily, ~np.isnan(daily), span_list)
+          returns = returns * period
+          risk = np.sqrt(var * period)
+          with np.errstate(divide='ignore', invalid='ignore') :
+               sharpe = np.where(risk != 0, (returns - risk_free_rate) / risk, 0)
+          empty = (count == 0) | (size < period)
+          ret = [ np.where(empty, 0, x) for x in [returns, risk, sharpe] ]
+          ret = [ pd.DataFrame(x.T, index=name_list, columns=list(span_list)) for x in ret ]
+          return dict(zip(cls.key_list, ret))
+
+class ROLLING() :
+      '''
+        Time series of the metrics over a trailing window of rows, for every column at once
+        Window sums come from prefix sums, so the cost is O(T) per ticker whatever the window
+          RETURNS, RISK, SHARPE - mean, std and sharpe of the daily returns (TRANSFORM_SHARPE parameters)
+          CAGR - growth over the window, annualized
+          DRAWDOWN - price against its highest price in the window, minus 1
+      '''
+      key_list = ['RETURNS','RISK','SHARPE','CAGR','DRAWDOWN']
+      @classmethod
+      def window_sum(cls, values, window) :
+          ret = np.cumsum(values, axis=0)
+          ret[window:] = ret[window:] - ret[:-window]
+          return ret
+      @classmethod
+      def moments(cls, daily, mask, window) :
+          '''
+          count, mean and sample variance of the valid returns in each window
+          returns are centred on their column mean first, sums of small numbers lose less precision
+          '''
+          count = mask.sum(axis=0)
+          center = np.where(mask, daily, 0.0).sum(axis=0) / np.maximum(count, 1)
+          x = np.where(mask, daily - center, 0.0)
+          count = cls.window_sum(mask.astype(np.float64), window)
+          total = cls.window_sum(x, window)
+          square = cls.window_sum(x * x, window)
+          with np.errstate(divide='ignore', invalid='ignore') :
+               mean = total / count
+               var = (square - total * mean) / (count - 1)
+          return count, mean + center, np.maximum(var, 0)
+      @classmethod
+      def find(cls, prices, window=HELPER.YEAR, min_periods=None, **kwargs) :
+          '''
+          prices : (dates x tickers) DataFrame
+          min_periods : valid returns a window needs, defaults to window (as DataFrame.rolling)
+          year : rows a year for CAGR, HELPER.periods of the price frequency
+          returns key -> (dates x tickers) DataFrame
+          '''
+          if min_periods is None :
+             min_periods = window
+          risk_free_rate, period, span = TRANSFORM_SHARPE.parameters(**kwargs)
+          target = 'year'
+          year = kwargs.get(target, HELPER.YEAR)
+          values = prices.values.astype(np.float64)
+          values[~np.isfinite(values)] = np.nan
+          mask = ~np.isnan(values)
+          daily = BACKGROUND.daily(values, mask)
+          count, returns, var = cls.moments(daily, ~np.isnan(daily), window)
+          enough = count >= max(min_periods, 2)
+          returns = np.where(enough, returns * period, np.nan)
+          risk = np.where(enough, np.sqrt(var * period), np.nan)
+          with np.errstate(divide='ignore', invalid='ignore') :
+               sharpe = np.where(risk != 0, (returns - risk_free_rate) / risk, 0)
+          sharpe = np.where(enough, sharpe, np.nan)
+
+          values = CALENDAR.fill(values, mask, 'ffill')
+          growth = np.full(values.shape, np.nan)
+          growth[window:] = values[window:] / values[:-window]
+          cagr = growth ** (year / float(window)) - 1
+          peak = pd.DataFrame(values).rolling(window, min_periods=1).max().values
+          drawdown = values / peak - 1
+
+          ret = [returns, risk, sharpe, cagr, drawdown]
+          ret = map(lambda x : pd.DataFrame(x, index=prices.index, columns=prices.columns), ret)
+          return dict(zip(cls.key_list, ret))
+
+class RISK() :
+      '''
+        Extended metrics of every column against one benchmark, on periodic (daily, monthly ...) returns
+        returns, benchmark, excess returns, masks and the sorted tails are built once and shared by every metric
+          period : returns per year (HELPER.YEAR for daily prices, 12 for monthly)
+          level : tail probability of the value at risk
+        metrics against the benchmark only use the dates where both have a return
+        SKEWNESS, EXCESS KURTOSIS - sample adjusted (Fisher-Pearson G1, G2) like pandas skew() and kurt(), NaN below 3 and 4 returns
+      '''
+      key_list = ['MEAN', 'VOLATILITY', 'DOWNSIDE DEVIATION', 'SORTINO', 'CALMAR', 'DRAWDOWN'
+                 , 'HISTORICAL VAR', 'ANALYTICAL VAR', 'CVAR', 'SKEWNESS', 'EXCESS KURTOSIS'
+                 , 'BETA', 'ALPHA', 'R2', 'CORRELATION', 'TREYNOR'
+                 , 'ACTIVE RETURN', 'TRACKING ERROR', 'INFORMATION RATIO'
+                 , 'UPSIDE CAPTURE', 'DOWNSIDE CAPTURE', 'POSITIVE PERIODS', 'GAIN LOSS']
+      @classmethod
+      def _mean(cls, values, mask, count) :
+          with np.errstate(divide='ignore', invalid='ignore') :
+               return np.where(mask, values, 0.0).sum(axis=0) / count
+      @classmethod
+      def _ratio(cls, a, b) :
+          with np.errstate(divide='ignore', invalid='ignore') :
+               return np.where(b != 0, a / b, np.nan)
+      @classmethod
+      def tails(cls, daily, count, level) :
+          '''
+          historical VaR and CVaR from one sort of every column (NaN sort last)
+          '''
+          tail = np.sort(daily, axis=0)
+          k = np.floor(level * count).astype(int)
+          k = np.clip(k, 0, np.maximum(count - 1, 0))
+          column = np.arange(daily.shape[1])
+          var = tail[k, column]
+          inside = np.arange(len(tail))[:, None] <= k[None, :]
+          cvar = np.where(inside, np.nan_to_num(tail), 0.0).sum(axis=0) / (k + 1)
+          empty = count == 0
+          return np.where(empty, np.nan, var), np.where(empty, np.nan, cvar)
+      @classmethod
+      def market(cls, benchmark, mask) :
+          '''
+          benchmark return over the same interval as each ticker's return (from its previous valid price)
+          '''
+          benchmark = CALENDAR.fill(benchmark[:, None], ~np.isnan(benchmark[:, None]), 'ffill')[:, 0]
+          index = np.where(mask, np.arange(len(mask))[:, None], -1)
+          index = np.maximum.accumulate(index, axis=0)
+          previous = np.vstack([np.full((1, mask.shape[1]), -1), index[:-1]])
+          with np.errstate(divide='ignore', invalid='ignore') :
+               ret = benchmark[:, None] / benchmark[np.maximum(previous, 0)] - 1
+          return np.where(mask & (previous >= 0), ret, np.nan)
+      @classmethod
+      def find(cls, prices, benchmark, period=HELPER.YEAR, risk_free_rate=0.02, level=0.05) :
+          '''
+          prices : (dates x tickers) DataFrame, tickers or portfolio values
+          benchmark : price Series, or the name of a column of prices e.g. '^GSPC'
+                      it is read on the dates of prices
+          returns ticker -> dict
+          '''
+          if isinstance(benchmark, str) :
+             benchmark = prices[benchmark]
+          name_list = list(prices.columns)
+          benchmark = benchmark[~benchmark.index.duplicated(keep='last')].reindex(prices.index)
+          values = prices.values.astype(np.float64)
+          values[~np.isfinite(values)] = np.nan
+          mask = ~np.isnan(values)
+          daily = BACKGROUND.daily(values, mask)
+          market = cls.market(benchmark.values.astype(np.float64), mask)
+
+          valid = ~np.isnan(daily)
+          count = valid.sum(axis=0)
+          mean = cls._mean(daily, valid, count)
+          centred = np.where(valid, daily - mean, 0.0)
+          m2 = (centred ** 2).sum(axis=0)
+          with np.errstate(divide='ignore', invalid='ignore') :
+               std = np.where(count > 1, np.sqrt(m2 / (count - 1)), np.nan)
+               skew = (centred ** 3).sum(axis=0) / count / (m2 / count) ** 1.5
+               kurtosis = (centred ** 4).sum(axis=0) / count / (m2 / count) ** 2 - 3
+               skew = np.where(count > 2, skew * np.sqrt(count * (count - 1)) / (count - 2), np.nan)
+               kurtosis = np.where(count > 3, ((count + 1) * kurtosis + 6) * (count - 1) / ((count - 2) * (count - 3)), np.nan)
+          target = risk_free_rate / period
+          downside = np.minimum(np.where(valid, daily, target) - target, 0)
+          with np.errstate(divide='ignore', invalid='ignore') :
+               downside = np.sqrt((downside ** 2).sum(axis=0) / count)
+          returns = mean * period
+          volatility = std * np.sqrt(period)
+          downside = downside * np.sqrt(period)
+          sortino = cls._ratio(returns - risk_free_rate, downside)
+
+          cagr, growth = BACKGROUND.cagr(values, mask, period)
+          drawdown, _ = DRAWDOWN.extremes(values, mask)
+          calmar = cls._ratio(cagr, -drawdown)
+
+          var, cvar = cls.tails(daily, count, level)
+          z = NormalDist().inv_cdf(level)
+          analytical = mean + z * std
+
+          joint = valid & ~np.isnan(market)
+          n = joint.sum(axis=0)
+          x = np.where(joint, daily, 0.0)
+          y = np.where(joint, market, 0.0)
+          x_mean = cls._mean(x, joint, n)
+          y_mean = cls._mean(y, joint, n)
+          dx = np.where(joint, x - x_mean, 0.0)
+          dy = np.where(joint, y - y_mean, 0.0)
+          n = np.where(n > 1, n, np.nan)
+          with np.errstate(divide='ignore', invalid='ignore') :
+               cov = (dx * dy).sum(axis=0) / (n - 1)
+               x_var = (dx ** 2).sum(axis=0) / (n - 1)
+               y_var = (dy ** 2).sum(axis=0) / (n - 1)
+               active = dx - dy
+               tracking = np.sqrt((active ** 2).sum(axis=0) / (n - 1)) * np.sqrt(period)
+          beta = cls._ratio(cov, y_var)
+          correlation = cls._ratio(cov, np.sqrt(x_var * y_var))
+          alpha = (x_mean - target - beta * (y_mean - target)) * period
+          treynor = cls._ratio(returns - risk_free_rate, beta)
+          active = (x_mean - y_mean) * period
+          information = cls._ratio(active, tracking)
+          up = joint & (market > 0)
+          down = joint & (market < 0)
+          upside = cls._ratio(cls._mean(x, up, up.sum(axis=0)), cls._mean(y, up, up.sum(axis=0)))
+          downside_capture = cls._ratio(cls._mean(x, down, down.sum(axis=0)), cls._mean(y, down, down.sum(axis=0)))
+
+          gain = valid & (daily > 0)
+          loss = valid & (daily < 0)
+          positive = cls._ratio(gain.sum(axis=0), count)
+          gain_loss = cls._ratio(cls._mean(daily, gain, gain.sum(axis=0)), -cls._mean(daily, loss, loss.sum(axis=0)))
+
+          metrics = [returns, volatility, downside, sortino, calmar, drawdown
+                    , var, analytical, cvar, skew, kurtosis
+                    , beta, alpha, correlation ** 2, correlation, treynor
+                    , active, tracking, information
+                    , upside, downside_capture, positive, gain_loss]
+          ret = {}
+          for i, name in enumerate(name_list) :
+              values = map(lambda x : round(float(x[i]),4), metrics)
+              ret[name] = dict(zip(cls.key_list, values))
+          return ret
+
+class GROWTH() :
+      '''
+        Growth and CAGR between any two dates for every ticker, from a cumulative log price index
+          index[t] = log(price[t] / first price), carried over gaps (PRICE_STORE.log_index)
+          NaN before the first and after the last price of a ticker
+          growth(start, end) = exp(index[end] - index[start]), two lookups whatever the window
+        years are counted in rows of the index, year rows a year (HELPER.periods of its frequency)
+      '''
+      def __init__(self, index, year=HELPER.YEAR) :
+          self.year = year
+          self.dates = pd.DatetimeIndex(index.index)
+          self.tickers = list(index.columns)
+          self.values = index.values.astype(np.float64)
+      def __str__(self) :
+          return "growth index : {} tickers, {} dates".format(len(self.tickers), len(self.dates))
+      @classmethod
+      def build(cls, prices, year=HELPER.YEAR) :
+          ret = PRICE_STORE.log_index(prices.values)
+          return cls(pd.DataFrame(ret, index=prices.index, columns=prices.columns), year)
+      @classmethod
+      def from_store(cls, store, stock_list=None) :
+          name, field = PRICE_STORE._log_index
+          year = HELPER.periods(store.frequency)
+          if name in store.fields :
+             return cls(store.read(name, stock_list), year)
+          return cls.build(store.read(field, stock_list), year)
+      def rows(self, dates) :
+          '''
+          last row on or before each date, -1 before the first
+          '''
+          dates = pd.DatetimeIndex(pd.to_datetime(list(dates)))
+          return self.dates.searchsorted(dates, side='right') - 1
+      def _growth(self, lo, hi) :
+          lo = np.asarray(lo)
+          hi = np.asarray(hi)
+          valid = (lo >= 0) & (hi >= 0)
+          ret = self.values[np.where(valid, hi, 0)] - self.values[np.where(valid, lo, 0)]
+          ret[~valid] = np.nan
+          return np.exp(ret)
+      def growth(self, start, end) :
+          '''
+          growth of every ticker from start to end
+          '''
+          lo, hi = self.rows([start, end])
+          return pd.Series(self._growth([lo], [hi])[0], index=self.tickers)
+      def cagr(self, start, end) :
+          lo, hi = self.rows([start, end])
+          years = (hi - lo) / float(self.year)
+          with np.errstate(divide='ignore', invalid='ignore') :
+               ret = self._growth([lo], [hi])[0] ** (1 / years) - 1
+          return pd.Series(ret, index=self.tickers)
+      def query(self, window_list) :
+          '''
+          window_list : list of (start, end) dates
+          returns (tickers x windows) CAGR, every window is one gather of two rows
+          '''
+          start, end = zip(*window_list)
+          lo = self.rows(start)
+          hi = self.rows(end)
+          years = (hi - lo) / float(self.year)
+          with np.errstate(divide='ignore', invalid='ignore') :
+               ret = self._growth(lo, hi) ** (1 / years[:, None]) - 1
+          return pd.DataFrame(ret.T, index=self.tickers, columns=list(window_list))
+      def horizons(self, interval=None, end=None) :
+          '''
+          CAGR over the last years of each interval, ending at end (default the last date)
+          same rows and columns as TRANSFORM_CAGR_SEGMENTS, NaN when there is not enough history
+          '''
+          if interval is None :
+             interval = TRANSFORM_CAGR_SEGMENTS._interval
+          hi = len(self.dates) - 1
+          if not (end is None) :
+             hi = self.rows([end])[0]
+          hi = np.full(len(interval), hi)
+          lo = hi + 1 - np.array(interval) * self.year
+          ret = self._growth(np.where(lo >= 0, lo, -1), hi)
+          ret = ret ** (1 / np.array(interval, dtype=np.float64)[:, None]) - 1
+          columns = [ 'CAGR {}'.format(i) for i in interval ]
+          return pd.DataFrame(ret.T, index=self.tickers, columns=columns)
+
+class ONLINE(object) :
+      '''
+        Running metrics of one ticker, advanced one day at a time without going back over its history
+          EWM mean / variance of daily returns for span (same recurrence as pandas ewm, adjust=True)
+          first and last price, price count, LEN, highest / lowest price so far and the drawdown extremes against them
+        The state covers its history from first onwards, rebuild() starts over from a full price series :
+          when a stored price was restated, or the saved history has been trimmed by more than drift days
+        Saved per data store as <path>/metrics.json
+        stream() takes the first date and LEN of each saved history from its MANIFEST and reads only the rows from last on
+      '''
+      _filename = 'metrics.json'
+      _prices = 'Adj Close'
+      drift = HELPER.MONTH
+      _fields = ['ticker', 'span', 'first', 'last', 'first_price', 'last_price', 'count', 'size'
+                , 'weight', 'weight2', 'mean', 'var', 'top', 'bottom', 'low', 'high', 'returns']
+      def __init__(self, ticker, span, **kwargs) :
+          self.ticker = ticker
+          self.span = span
+          self.first = None
+          self.last = None
+          self.first_price = np.nan
+          self.last_price = np.nan
+          self.count = 0
+          self.size = 0
+          self.weight = 0.0
+          self.weight2 = 0.0
+          self.mean = 0.0
+          self.var = 0.0
+          self.top = np.nan
+          self.bottom = np.nan
+          self.low = np.nan
+          self.high = np.nan
+          self.returns = 0
+          for key in kwargs :
+              setattr(self, key, kwargs[key])
+      def __str__(self) :
+          return "{} : {} prices {} - {}".format(self.ticker, self.count, self.first, self.last)
+      def to_dict(self) :
+          return dict(map(lambda key : (key, getattr(self, key)), self._fields))
+      @property
+      def decay(self) :
+          if self.span == 0 :
+             return 1.0
+          return 1 - 2.0 / (self.span + 1)
+
+      @classmethod
+      def rebuild(cls, ticker, prices, span=2*HELPER.YEAR, size=None) :
+          '''
+          state of a full price series in one set of numpy operations
+          '''
+          ret = cls(ticker, span)
+          ret.size = len(prices) if size is None else size
+          prices = prices[np.isfinite(prices.values)]
+          values = prices.values.astype(np.float64)
+          if len(values) == 0 :
+             return ret
+          ret.first, ret.last = str(prices.index[0].date()), str(prices.index[-1].date())
+          ret.first_price, ret.last_price = float(values[0]), float(values[-1])
+          ret.count = len(values)
+          ret.top, ret.bottom = float(values.max()), float(values.min())
+          ret.low = float((values / np.maximum.accumulate(values)).min() - 1)
+          ret.high = float((values / np.minimum.accumulate(values)).max() - 1)
+          daily = values[1:] / values[:-1] - 1
+          ret.returns = len(daily)
+          if ret.returns == 0 :
+             return ret
+          weights = ret.decay ** np.arange(ret.returns - 1, -1, -1)
+          ret.weight = float(weights.sum())
+          ret.weight2 = float(weights.dot(weights))
+          ret.mean = float(weights.dot(daily) / ret.weight)
+          ret.var = float(weights.dot((daily - ret.mean) ** 2) / ret.weight)
+          return ret
+      def update(self, date, price) :
+          '''
+          one new valid price, O(1)
+          '''
+          if self.count == 0 :
+             self.first = str(date.date())
+             self.first_price = price
+             self.top, self.bottom = price, price
+             self.low, self.high = 0.0, 0.0
+          else :
+             self.add(price / self.last_price - 1)
+          self.top = max(self.top, price)
+          self.bottom = min(self.bottom, price)
+          self.low = min(self.low, price / self.top - 1)
+          self.high = max(self.high, price / self.bottom - 1)
+          self.last = str(date.date())
+          self.last_price = price
+          self.count += 1
+      def add(self, daily) :
+          decay = self.decay
+          weight = self.weight * decay
+          total = weight + 1
+          mean = self.mean + (daily - self.mean) / total
+          self.var = (weight * (self.var + (self.mean - mean) ** 2) + (daily - mean) ** 2) / total
+          self.mean = mean
+          self.weight = total
+          self.weight2 = self.weight2 * decay * decay + 1
+          self.returns += 1
+
+      def stale(self, prices, first=None) :
+          '''
+          prices : saved history from last on at least, True when the state no longer continues it
+          first : first date of the saved history, defaults to the first date of prices
+          '''
+          if self.count == 0 or len(prices) == 0 :
+             return True
+          if np.isnan(self.top) :
+             return True
+          if first is None :
+             first = prices.index[0]
+          first = pd.Timestamp(first)
+          start = pd.Timestamp(self.first)
+          if first < start :
+             return True
+          if len(pd.bdate_range(start, first)) - 1 > self.drift :
+             return True
+          last = pd.Timestamp(self.last)
+          if last not in prices.index :
+             return True
+          return not np.isclose(prices[last], self.last_price, rtol=1e-4)
+      def advance(self, prices, size=None, first=None) :
+          '''
+          prices : saved history of the ticker, only the rows after last are read
+                   rebuilt from prices when stale, which then have to be the full history
+          '''
+          if self.stale(prices, first) :
+             logging.debug('{} rebuilt'.format(self))
+             ret = self.rebuild(self.ticker, prices, self.span, size)
+             self.__dict__.update(ret.__dict__)
+             return self
+          lo, hi = PRICE_STORE.bounds(prices.index, pd.Timestamp(self.last) + pd.Timedelta(days=1))
+          delta = prices.iloc[lo:hi]
+          self.size = len(prices) if size is None else size
+          for date, price in delta[np.isfinite(delta.values)].items() :
+              self.update(date, float(price))
+          return self
+      def find(self, **kwargs) :
+          '''
+          the dict of TRANSFORM_BACKGROUND.find
+          '''
+          risk_free_rate, period, span = TRANSFORM_SHARPE.parameters(**kwargs)
+          returns, risk, sharpe = 0, 0, 0
+          if self.returns > 0 and self.size >= period :
+             returns = self.mean * period
+             risk = np.nan
+             if self.returns > 1 :
+                total = self.weight ** 2
+                risk = np.sqrt(self.var * total / (total - self.weight2)) * np.sqrt(period)
+             sharpe = TRANSFORM_SHARPE.sharpe(risk, returns, risk_free_rate)
+          growth, cagr = np.nan, np.nan
+          if self.count > 0 :
+             growth = self.last_price / self.first_price
+             cagr = growth ** (1 / (self.count / float(HELPER.YEAR))) - 1
+          values = [ round(float(x),4) for x in [returns, risk, sharpe] ]
+          values += [ self.size ]
+          values += [ round(float(x),4) for x in [cagr, growth] ]
+          values += [ float(self.low), float(self.high) ]
+          return dict(zip(TRANSFORM_BACKGROUND.key_list, values))
+
+      @classmethod
+      def filename(cls, path) :
+          return '{}/{}'.format(path, cls._filename)
+      @classmethod
+      def load(cls, path) :
+          '''
+          an unreadable state file counts as empty, every ticker is rebuilt
+          '''
+          filename = cls.filename(path)
+          if not os.path.exists(filename) :
+             return {}
+          try :
+             with open(filename) as fp :
+                  state = json.load(fp)
+             ret = map(lambda key : (key, cls(**state[key])), state)
+             return dict(ret)
+          except (ValueError, TypeError) as e :
+             logging.warning('{} unreadable, every ticker is rebuilt : {}'.format(filename, e))
+             return {}
+      @classmethod
+      def save(cls, path, state) :
+          '''
+          written to a temporary file and renamed into place, a killed run leaves the previous state
+          '''
+          ret = map(lambda key : (key, state[key].to_dict()), state)
+          ret = dict(ret)
+          fd, temp = tempfile.mkstemp(dir=path, suffix='.tmp')
+          try :
+             with os.fdopen(fd, 'w') as fp :
+                  json.dump(ret, fp, sort_keys=True, indent=1)
+             os.replace(temp, cls.filename(path))
+          except :
+             os.remove(temp)
+             raise
+          logging.info("{} tickers saved to {}".format(len(ret), cls.filename(path)))
+      def refresh(self, filename, first, size) :
+          '''
+          filename : saved history, a STOCK_TIMESERIES pkl
+          first, size : its first date and LEN, e.g. from its MANIFEST entry
+          the rows from last on are read, the whole history only when the state has to be rebuilt
+          returns None when the file has no prices
+          '''
+          if self.count > 0 :
+             name, data = STOCK_TIMESERIES.load(filename, start=self.last, columns=self._prices)
+             if self._prices in data and not self.stale(data[self._prices], first) :
+                return self.advance(data[self._prices], size, first)
+          name, data = STOCK_TIMESERIES.load(filename, columns=self._prices)
+          if self._prices not in data :
+             return None
+          logging.debug('{} rebuilt'.format(self))
+          ret = self.rebuild(self.ticker, data[self._prices], self.span, size)
+          self.__dict__.update(ret.__dict__)
+          return self
+      @classmethod
+      def stream(cls, path, ticker_list, **kwargs) :
+          '''
+          path : data store of per ticker pkl files, its MANIFEST gives the file, first date and LEN of each ticker
+          advances the saved state of each ticker and yields (ticker, dict) like BACKGROUND.stream
+          a ticker whose file cannot be read is logged and skipped, its state dropped
+          the state is saved however the stream ends, tickers not reached keep their previous state
+          '''
+          risk_free_rate, period, span = TRANSFORM_SHARPE.parameters(**kwargs)
+          manifest = STOCK_TIMESERIES.manifest(path)
+          state = cls.load(path)
+          try :
+             for ticker in ticker_list :
+                 if ticker not in manifest :
+                    logging.warning('{} not in {}'.format(ticker, manifest))
+                    state.pop(ticker, None)
+                    continue
+                 entry = manifest[ticker]
+                 ret = state.get(ticker, None)
+                 if ret is None or ret.span != span :
+                    ret = cls(ticker, span)
+                 try :
+                    ret = ret.refresh(manifest.path_of(ticker), entry['first'], entry['rows'])
+                 except Exception as e :
+                    logging.error('{} skipped : {}'.format(ticker, e), exc_info=True)
+                    state.pop(ticker, None)
+                    continue
+                 if ret is None :
+                    logging.warning('{} has no {}'.format(ticker, cls._prices))
+                    state.pop(ticker, None)
+                    continue
+                 state[ticker] = ret
+                 yield ticker, ret.find(**kwargs)
+          finally :
+             cls.save(path, state)
@@ -107,12 +107,12 @@ class PORTFOLIO :
       columns = ['returns','risk','sharpe']
 
       @classmethod
-      def _weights(cls, size, num_portfolios) :
+      def _weights(cls, size, num_portfolios, random=np.random) :
           low = 0.1
           high = low + low + (1/size) 
           for i in xrange(num_portfolios):
               #select random weights for portfolio holdings
-              weights = np.random.uniform(low=low, high=high, size=size)
+              weights = random.uniform(low=low, high=high, size=size)
               weights = np.array(weights)
               #rebalance weights to sum to 1
               weights /= np.sum(weights)
@@ -135,7 +135,7 @@ class PORTFOLIO :
           return returns, risk, sharpe
 
       @classmethod
-      def _find(cls, data, stocks, num_portfolios, risk_free_rate, period) :
+      def _find(cls, data, stocks, num_portfolios, risk_free_rate, period, seed=None) :
           data.sort_index(inplace=True)
           returns = FINANCE.findDailyReturns(data)
 
@@ -147,7 +147,9 @@ class PORTFOLIO :
           #calculate mean daily return and covariance of daily returns
           mean = returns.mean()
           cov_matrix = returns.cov()
-          for weights, i in cls._weights(size, num_portfolios) :
+          #seed : None uses numpy's global random state
+          random = np.random if seed is None else np.random.default_rng(seed)
+          for weights, i in cls._weights(size, num_portfolios, random) :
               returns, risk, sharpe = cls._sharpe(cov_matrix, mean, period, risk_free_rate, weights)
               #store results in results array
               ret[0,i] = returns
@@ -212,11 +214,13 @@ class PORTFOLIO :
           period = kwargs.get(target,252)
           target = "risk_free_rate"
           risk_free_rate = kwargs.get(target,0.02)
+          target = "seed"
+          seed = kwargs.get(target,None)
           data, stocks, num_portfolios, risk_free_rate, period = cls.validate(data, stocks, num_portfolios, risk_free_rate, period)
           if data is None :
               return pd.DataFrame(), pd.DataFrame()
 
-          ret = cls._find(data, stocks, num_portfolios, risk_free_rate, period)
+          ret = cls._find(data, stocks, num_portfolios, risk_free_rate, period, seed)
 
           #locate position of portfolio with highest Sharpe Ratio
           max_sharpe = ret['sharpe'].idxmax()
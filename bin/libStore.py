@@ -0,0 +1,567 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+import pandas as pd
+
+from libUtils import log_on_exception
+
+'''
+  PRICE_STORE - consolidated, date aligned price store
+              - one (dates x tickers) matrix per field, saved as .npy and memory mapped on read
+              - small index (tickers, dates) so a single field loads without unpickling every ticker
+
+  Layout on disk :
+      <path>/index.npz       tickers, dates, fields
+      <path>/Adj_Close.npy   (dates x tickers) float64, NaN where a ticker has no price
+      <path>/Volume.npy      ...
+  float32 matrices (build dtype) halve the footprint, read() still returns float64
+  <path>/Log_Index.npy   log(price / first price) of Adj Close, growth between two dates is exp(difference)
+  <path>/<frequency>/    derived store of period closes and returns (resample), e.g. weekly, monthly, quarterly
+  build writes a new store beside <path> and renames it into place, readers see the old store or the new one, never a mix
+
+  MANIFEST - ticker to file index for a directory of per ticker pkl files
+           - lets readers find a ticker without scanning or unpickling every file
+
+  SHARED_MATRIX - (dates x tickers) matrix in multiprocessing.shared_memory
+                - process pool workers attach by name and get a zero copy view
+
+  CALENDAR - canonical trading day index, one per run (CALENDAR.instance())
+           - aligns any set of tickers onto it in one pass with an explicit fill policy
+'''
+
+class PRICE_STORE(object) :
+      fields = ['Open','High','Low','Close','Adj Close','Volume']
+      _index = 'index.npz'
+      _log_index = ('Log Index', 'Adj Close')
+      _returns = ('Returns', 'Adj Close')
+      def __init__(self, path, tickers, dates, fields, frequency='daily') :
+          self.path = path
+          self.tickers = tickers
+          self.dates = dates
+          self.fields = fields
+          self.frequency = frequency
+          self.columns = dict(zip(tickers, range(len(tickers))))
+          self._cache = {}
+      def __str__(self) :
+          ret = "{} : {} tickers, {} dates, {}".format(self.path, len(self.tickers), len(self.dates), self.fields)
+          return ret
+      def __contains__(self, ticker) :
+          return ticker in self.columns
+      def __len__(self) :
+          return len(self.tickers)
+
+      @classmethod
+      def filename(cls, path, field) :
+          field = field.replace(' ','_')
+          return '{}/{}.npy'.format(path, field)
+      @classmethod
+      def exists(cls, path) :
+          if path is None :
+             return False
+          return os.path.exists('{}/{}'.format(path, cls._index))
+
+      @classmethod
+      def build(cls, path, data, fields=None, dtype=None, frequency='daily') :
+          '''
+          data : iterable of (ticker, DataFrame) e.g. STOCK_TIMESERIES.bulk
+          dtype : np.float64 (default) or np.float32 for a compact store
+          frequency : label of the rows, saved in the index
+          a rebuild replaces the whole directory, derived stores included
+          '''
+          if fields is None :
+             fields = cls.fields
+          if dtype is None :
+             dtype = np.float64
+          path = os.path.normpath(path)
+          parent, name = os.path.split(path)
+          if not os.path.exists(parent or '.') :
+             os.makedirs(parent, exist_ok=True)
+          work = tempfile.mkdtemp(prefix='.{}.'.format(name), dir=parent or '.')
+          try :
+             cls._build(work, data, fields, dtype, frequency)
+             cls._swap(work, path)
+          finally :
+             shutil.rmtree(work, ignore_errors=True)
+          return cls.open(path)
+      @classmethod
+      def _swap(cls, work, path) :
+          '''
+          old store is renamed away rather than overwritten, processes that still map its files keep reading them
+          '''
+          if not os.path.exists(path) :
+             os.rename(work, path)
+             return
+          old = tempfile.mkdtemp(prefix='.{}.'.format(os.path.basename(path)), dir=os.path.dirname(path) or '.')
+          os.rename(path, '{}/store'.format(old))
+          os.rename(work, path)
+          shutil.rmtree(old, ignore_errors=True)
+      @classmethod
+      def _build(cls, path, data, fields, dtype, frequency) :
+          index_list, value_list, tickers = cls._collect(data, fields)
+          dates = cls._union(index_list)
+          logging.info("{} tickers, {} dates".format(len(tickers), len(dates)))
+          for i, field in enumerate(fields) :
+              filename = cls.filename(path, field)
+              ret = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=(len(dates), len(tickers)))
+              ret[:] = np.nan
+              for j, index in enumerate(index_list) :
+                  row = dates.searchsorted(index)
+                  ret[row, j] = value_list[j][i]
+              ret.flush()
+              del ret
+          name, field = cls._log_index
+          if field in fields :
+             ret = np.load(cls.filename(path, field), mmap_mode='r')
+             np.save(cls.filename(path, name), cls.log_index(ret).astype(dtype))
+             fields = list(fields) + [name]
+          filename = '{}/{}'.format(path, cls._index)
+          np.savez(filename, tickers=np.array(tickers, dtype=str), dates=dates.values, fields=np.array(fields, dtype=str)
+                  , frequency=np.array(frequency))
+      @classmethod
+      def _collect(cls, data, fields) :
+          index_list = []
+          value_list = []
+          tickers = []
+          for ticker, frame in data :
+              if frame is None or len(frame) == 0 :
+                 continue
+              if ticker in tickers :
+                 logging.warning('duplicate ticker {}, keeping the last'.format(ticker))
+                 j = tickers.index(ticker)
+                 del tickers[j], index_list[j], value_list[j]
+              frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+              values = map(lambda field : cls._values(frame, field), fields)
+              tickers.append(ticker)
+              index_list.append(frame.index.values)
+              value_list.append(list(values))
+          return index_list, value_list, tickers
+      @classmethod
+      def _values(cls, frame, field) :
+          if field not in frame :
+             return np.full(len(frame), np.nan)
+          return frame[field].values.astype(np.float64)
+      @classmethod
+      def _union(cls, index_list) :
+          if len(index_list) == 0 :
+             return pd.DatetimeIndex([])
+          ret = np.concatenate(index_list)
+          ret = np.unique(ret)
+          return pd.DatetimeIndex(ret)
+
+      @classmethod
+      def log_index(cls, values) :
+          '''
+          (dates x tickers) log(price / first price), carried over gaps, NaN before the first and after the last price
+          '''
+          values = np.asarray(values, dtype=np.float64)
+          mask = np.isfinite(values) & (values > 0)
+          values = CALENDAR.fill(np.where(mask, values, np.nan), mask, 'ffill')
+          first = values[np.minimum(CALENDAR.start(mask), max(len(mask) - 1, 0)), np.arange(values.shape[1])]
+          after = np.arange(len(mask))[:, None] >= (len(mask) - CALENDAR.start(mask[::-1]))[None, :]
+          with np.errstate(divide='ignore', invalid='ignore') :
+               ret = np.log(values) - np.log(first)
+          ret[after] = np.nan
+          return ret
+      @classmethod
+      def open(cls, path) :
+          filename = '{}/{}'.format(path, cls._index)
+          index = np.load(filename)
+          tickers = index['tickers'].tolist()
+          dates = pd.DatetimeIndex(index['dates'])
+          fields = index['fields'].tolist()
+          frequency = 'daily'
+          if 'frequency' in index.files :
+             frequency = str(index['frequency'])
+          ret = cls(path, tickers, dates, fields, frequency)
+          logging.debug(str(ret))
+          return ret
+      def matrix(self, field='Adj Close') :
+          '''
+          read only memory map, nothing is read from disk until it is touched
+          '''
+          if field not in self.fields :
+             raise KeyError('{} not in {}'.format(field, self.fields))
+          if field not in self._cache :
+             filename = self.filename(self.path, field)
+             self._cache[field] = np.load(filename, mmap_mode='r')
+          return self._cache[field]
+      @classmethod
+      def bounds(cls, dates, start=None, end=None) :
+          '''
+          row range [lo, hi) of sorted dates between start and end (both inclusive), by binary search
+          '''
+          lo = 0
+          hi = len(dates)
+          if not (start is None) :
+             lo = dates.searchsorted(pd.Timestamp(start), side='left')
+          if not (end is None) :
+             hi = dates.searchsorted(pd.Timestamp(end), side='right')
+          return lo, max(lo, hi)
+      def rows(self, start=None, end=None) :
+          lo, hi = self.bounds(self.dates, start, end)
+          return slice(lo, hi)
+      def position(self, stock_list) :
+          stock_list = filter(lambda x : x in self.columns, stock_list)
+          stock_list = list(stock_list)
+          ret = map(lambda x : self.columns[x], stock_list)
+          return stock_list, list(ret)
+      def read(self, field='Adj Close', stock_list=None, start=None, end=None) :
+          '''
+          start, end : only the pages of the memory map between them are read
+          '''
+          rows = self.rows(start, end)
+          ret = self.matrix(field)[rows]
+          dates = self.dates[rows]
+          if stock_list is None :
+             ret = ret.astype(np.float64, copy=False)
+             return pd.DataFrame(ret, index=dates, columns=self.tickers, copy=False)
+          stock_list, position = self.position(stock_list)
+          ret = ret[:, position].astype(np.float64, copy=False)
+          return pd.DataFrame(ret, index=dates, columns=stock_list, copy=False)
+      def series(self, ticker, field='Adj Close', start=None, end=None) :
+          rows = self.rows(start, end)
+          ret = self.matrix(field)[rows, self.columns[ticker]].astype(np.float64)
+          ret = pd.Series(ret, index=self.dates[rows], name=ticker)
+          return ret.dropna()
+
+      def resample(self, frequency, rule, dtype=None) :
+          '''
+          derived store in <path>/<frequency>, built once from Adj Close
+            Adj Close : last price of each period (rule, e.g. HELPER.RESAMPLE_MONTH), rows are the period ends
+            Returns : from the previous period close of the same ticker, periods without a price are skipped
+          '''
+          name, field = self._returns
+          prices = self.read(field).resample(rule).last()
+          prices = prices.dropna(how='all')
+          values = prices.values
+          mask = ~np.isnan(values)
+          returns = CALENDAR.returns(values, mask)
+          data = []
+          for j, ticker in enumerate(prices.columns) :
+              frame = pd.DataFrame({ field : values[:, j], name : returns[:, j] }, index=prices.index)
+              data.append((ticker, frame[mask[:, j]]))
+          path = '{}/{}'.format(self.path, frequency)
+          ret = self.build(path, data, [field, name], dtype, frequency)
+          logging.info(str(ret))
+          return ret
+      def resampled(self, frequency) :
+          '''
+          derived store built by resample
+          '''
+          path = '{}/{}'.format(self.path, frequency)
+          if not self.exists(path) :
+             raise KeyError('{} not built for {}'.format(frequency, self.path))
+          return self.open(path)
+
+class MANIFEST(object) :
+      '''
+        ticker -> file, size, mtime, first/last date, row count for a directory of pkl files
+        saved as <path>/manifest.json, entries are refreshed when their file changes
+      '''
+      _filename = 'manifest.json'
+      _extension = '.pkl'
+      _cache = {}
+      def __init__(self, path, entries) :
+          self.path = path
+          self.entries = entries
+          self.mtime = None
+      def __str__(self) :
+          return "{} : {} tickers".format(self.path, len(self.entries))
+      def __contains__(self, ticker) :
+          return ticker in self.entries
+      def __getitem__(self, ticker) :
+          return self.entries[ticker]
+      def path_of(self, ticker) :
+          return '{}/{}'.format(self.path, self.entries[ticker]['file'])
+
+      @classmethod
+      def filename(cls, path) :
+          return '{}/{}'.format(path, cls._filename)
+      @classmethod
+      def read(cls, path) :
+          filename = cls.filename(path)
+          if not os.path.exists(filename) :
+             return {}
+          try :
+             with open(filename) as fp :
+                  return json.load(fp)
+          except ValueError as e :
+             logging.warning('{} unreadable, every file is rescanned : {}'.format(filename, e))
+             return {}
+      def save(self) :
+          '''
+          written to a temporary file and renamed into place, a reader never sees half a manifest
+          '''
+          filename = self.filename(self.path)
+          fd, temp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+          try :
+             with os.fdopen(fd, 'w') as fp :
+                  json.dump(self.entries, fp, sort_keys=True, indent=1)
+             os.replace(temp, filename)
+          except :
+             os.remove(temp)
+             raise
+          self.mtime = os.stat(self.path).st_mtime_ns
+          logging.info("{} saved to {}".format(str(self), filename))
+
+      @classmethod
+      def open(cls, path, loader) :
+          '''
+          loader : filename -> (ticker, DataFrame) e.g. STOCK_TIMESERIES.load
+          '''
+          ret = cls._cache.get(path, None)
+          if not (ret is None) and ret.mtime == os.stat(path).st_mtime_ns :
+             return ret
+          if ret is None :
+             ret = cls(path, cls.read(path))
+          if ret.refresh(loader) :
+             ret.save()
+          ret.mtime = os.stat(path).st_mtime_ns
+          cls._cache[path] = ret
+          return ret
+      @classmethod
+      def touch(cls, filename) :
+          '''
+          files are rewritten in place, so drop the cached copy of their directory
+          '''
+          path = os.path.dirname(filename)
+          cls._cache.pop(path, None)
+      @classmethod
+      def stat(cls, path) :
+          ret = {}
+          for entry in os.scandir(path) :
+              if not entry.name.endswith(cls._extension) :
+                 continue
+              stat = entry.stat()
+              ret[entry.name] = (stat.st_size, stat.st_mtime_ns)
+          return ret
+      def refresh(self, loader) :
+          stats = self.stat(self.path)
+          known = map(lambda entry : (entry['file'], entry), self.entries.values())
+          known = dict(known)
+          changed = sorted(known) != sorted(stats)
+          entries = {}
+          for name in sorted(stats) :
+              size, mtime = stats[name]
+              entry = known.get(name, None)
+              if entry is None or entry['size'] != size or entry['mtime'] != mtime :
+                 entry = self.entry(loader, self.path, name, size, mtime)
+                 changed = True
+              if entry is None :
+                 continue
+              entries[entry['ticker']] = entry
+          self.entries = entries
+          return changed
+      @classmethod
+      @log_on_exception
+      def entry(cls, loader, path, name, size, mtime) :
+          ticker, data = loader('{}/{}'.format(path, name))
+          ret = { 'ticker' : ticker, 'file' : name, 'size' : size, 'mtime' : mtime, 'rows' : len(data) }
+          ret['first'] = None
+          ret['last'] = None
+          if len(data) > 0 :
+             ret['first'] = str(data.index.min().date())
+             ret['last'] = str(data.index.max().date())
+          return ret
+
+      @classmethod
+      def lookup(cls, file_list, loader) :
+          '''
+          ticker -> filename, restricted to the files in file_list
+          '''
+          file_list = set(file_list)
+          path_list = map(lambda filename : os.path.dirname(filename), file_list)
+          path_list = sorted(set(path_list))
+          ret = {}
+          for path in path_list :
+              manifest = cls.open(path, loader)
+              for ticker in manifest.entries :
+                  filename = manifest.path_of(ticker)
+                  if ticker in ret or filename not in file_list :
+                     continue
+                  ret[ticker] = filename
+          return ret
+
+class SHARED_MATRIX(object) :
+      '''
+        Owner : ret = SHARED_MATRIX.create(frame) ... ret.unlink()
+        Worker : with SHARED_MATRIX.attach(spec) as ret : ret.values
+        spec is a small picklable dict (name, shape, dtype, tickers, dates), pass it to the workers instead of the data
+      '''
+      def __init__(self, shm, spec, owner=False) :
+          self.shm = shm
+          self.spec = spec
+          self.owner = owner
+          self.tickers = spec['tickers']
+          self.dates = pd.DatetimeIndex(spec['dates'])
+          self.values = np.ndarray(spec['shape'], dtype=np.dtype(spec['dtype']), buffer=shm.buf)
+      def __str__(self) :
+          return "{name} : {shape} {dtype}".format(**self.spec)
+      def __enter__(self) :
+          return self
+      def __exit__(self, *largs) :
+          if self.owner :
+             self.unlink()
+          else :
+             self.close()
+      @classmethod
+      def create(cls, data) :
+          values = np.ascontiguousarray(data.values, dtype=np.float64)
+          shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+          spec = { 'name' : shm.name, 'shape' : values.shape, 'dtype' : values.dtype.str
+                 , 'tickers' : list(data.columns), 'dates' : data.index.values }
+          ret = cls(shm, spec, owner=True)
+          ret.values[:] = values
+          logging.info(str(ret))
+          return ret
+      @classmethod
+      def attach(cls, spec) :
+          # workers must not unlink the block when they exit, only the owner does
+          register = resource_tracker.register
+          resource_tracker.register = lambda *largs, **kwargs : None
+          try :
+             shm = shared_memory.SharedMemory(name=spec['name'])
+          finally :
+             resource_tracker.register = register
+          return cls(shm, spec)
+      def frame(self) :
+          return pd.DataFrame(self.values, index=self.dates, columns=self.tickers, copy=False)
+      def close(self) :
+          self.values = None
+          self.shm.close()
+      def unlink(self) :
+          self.close()
+          self.shm.unlink()
+
+class CALENDAR(object) :
+      '''
+        fill : how gaps after a ticker's first price are filled
+               None leaves NaN, 'ffill' carries the last price, 'bfill' the next one, 'zero' uses 0
+        head : how rows before a ticker's first price (its start offset) are filled
+               None leaves NaN, 'bfill' repeats the first price, 'zero' uses 0
+        fill='bfill', head='bfill' is the same as DataFrame.fillna(method='bfill')
+        dates that are new to the calendar are merged in, so it grows to the union of everything aligned
+      '''
+      _instance = None
+      def __init__(self, dates=None) :
+          if dates is None :
+             dates = []
+          self.dates = pd.DatetimeIndex(np.unique(pd.DatetimeIndex(dates).values), name='Date')
+      def __str__(self) :
+          if len(self.dates) == 0 :
+             return "calendar : empty"
+          return "calendar : {} dates {} - {}".format(len(self.dates), self.dates[0].date(), self.dates[-1].date())
+      def __len__(self) :
+          return len(self.dates)
+      @classmethod
+      def instance(cls, dates=None) :
+          if cls._instance is None :
+             cls._instance = cls(dates)
+          elif not (dates is None) :
+             cls._instance.extend([pd.DatetimeIndex(dates).values])
+          return cls._instance
+      def extend(self, index_list) :
+          index_list = list(filter(lambda x : len(x) > 0, index_list))
+          if len(index_list) == 0 :
+             return
+          index = np.concatenate(index_list)
+          if np.isin(index, self.dates.values).all() :
+             return
+          index = np.unique(np.concatenate([self.dates.values, index]))
+          self.dates = pd.DatetimeIndex(index, name='Date')
+          logging.debug(str(self))
+
+      @classmethod
+      def _collect(cls, data) :
+          if isinstance(data, pd.DataFrame) :
+             data = data.to_dict('series')
+          name_list = []
+          index_list = []
+          value_list = []
+          for name in data :
+              series = data[name]
+              series = series[~series.index.duplicated(keep='last')]
+              name_list.append(name)
+              index_list.append(pd.DatetimeIndex(series.index).values)
+              value_list.append(series.values.astype(np.float64))
+          return name_list, index_list, value_list
+      def matrix(self, data) :
+          '''
+          (dates x tickers) matrix on the calendar, NaN where a ticker has no price
+          '''
+          name_list, index_list, value_list = self._collect(data)
+          self.extend(index_list)
+          ret = np.full((len(self.dates), len(name_list)), np.nan)
+          for i, index in enumerate(index_list) :
+              ret[self.dates.searchsorted(index), i] = value_list[i]
+          return name_list, ret
+      @classmethod
+      def start(cls, mask) :
+          '''
+          per ticker offset of the first valid row
+          '''
+          return np.where(mask.any(axis=0), mask.argmax(axis=0), len(mask))
+      def offsets(self, data) :
+          name_list, ret = self.matrix(data)
+          ret = self.start(~np.isnan(ret))
+          return pd.Series(ret, index=name_list)
+
+      @classmethod
+      def _ffill(cls, values, mask) :
+          index = np.where(mask, np.arange(len(mask))[:, None], 0)
+          index = np.maximum.accumulate(index, axis=0)
+          return np.take_along_axis(values, index, axis=0)
+      @classmethod
+      def fill(cls, values, mask, fill=None) :
+          if fill is None :
+             return values
+          if fill == 'ffill' :
+             return cls._ffill(values, mask)
+          if fill == 'bfill' :
+             return cls._ffill(values[::-1], mask[::-1])[::-1]
+          if fill == 'zero' :
+             return np.where(mask, values, 0.0)
+          raise ValueError('unknown fill {}'.format(fill))
+      @classmethod
+      def returns(cls, values, mask) :
+          '''
+          return from the previous valid price of the same column, NaN on its first
+          '''
+          previous = cls.fill(values, mask, 'ffill')
+          previous = np.vstack([np.full((1, values.shape[1]), np.nan), previous[:-1]])
+          with np.errstate(divide='ignore', invalid='ignore') :
+               ret = values / previous - 1
+          ret[~mask] = np.nan
+          return ret
+      @classmethod
+      def head(cls, values, start, head=None) :
+          if len(values) == 0 :
+             return values
+          before = np.arange(len(values))[:, None] < start[None, :]
+          if head is None :
+             return np.where(before, np.nan, values)
+          if head == 'bfill' :
+             first = np.minimum(start, len(values) - 1)
+             first = values[first, np.arange(values.shape[1])]
+             return np.where(before, first[None, :], values)
+          if head == 'zero' :
+             return np.where(before, 0.0, values)
+          raise ValueError('unknown head {}'.format(head))
+      def align(self, data, fill='ffill', head=None) :
+          '''
+          data : DataFrame or dict of ticker -> Series
+          rows where no ticker has a price are dropped, like pd.DataFrame(dict).dropna(how='all')
+          '''
+          name_list, ret = self.matrix(data)
+          mask = ~np.isnan(ret)
+          keep = mask.any(axis=1)
+          ret = ret[keep]
+          mask = mask[keep]
+          start = self.start(mask)
+          ret = self.fill(ret, mask, fill)
+          ret = self.head(ret, start, head)
+          return pd.DataFrame(ret, index=self.dates[keep], columns=name_list)
@@ -1,6 +1,8 @@
 import logging
 import os
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from glob import glob
 from time import time as _now
 from functools import reduce
@@ -21,12 +23,46 @@ from libDecorators import http_200
         This chaining allows for more rapid development both in execution and debugging.
   TIMER - performance metric tracking
           TODO - create a decorator that can log performance of a function.
+  prefetch - run a loader on a pool while the consumer works on the previous result
 '''
 def combinations(stock_list,size=5) :
     ret_list = iter_combo(stock_list,size)
     for ret in list(ret_list):
         yield list(ret)
 
+def prefetch(func, arg_list, workers=4, read_ahead=None, ordered=True, processes=False) :
+    '''
+    Generator of (arg, func(arg)), func is run on a thread (or process) pool
+    read_ahead - most results held in memory at once, defaults to 2 * workers
+    ordered    - yield in the order of arg_list, otherwise as soon as each is done
+    workers < 1 runs in the calling thread
+    '''
+    if workers < 1 :
+       for arg in arg_list :
+           yield arg, func(arg)
+       return
+    if read_ahead is None or read_ahead < 1 :
+       read_ahead = 2 * workers
+    pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    arg_list = iter(arg_list)
+    pending = deque()
+    with pool(max_workers=workers) as executor :
+         for arg in arg_list :
+             pending.append((arg, executor.submit(func, arg)))
+             if len(pending) >= read_ahead :
+                break
+         while len(pending) > 0 :
+             if ordered :
+                arg, future = pending.popleft()
+             else :
+                done, not_done = wait(map(lambda x : x[1], pending), return_when=FIRST_COMPLETED)
+                arg, future = next(filter(lambda x : x[1] in done, pending))
+                pending.remove((arg, future))
+             for arg_next in arg_list :
+                 pending.append((arg_next, executor.submit(func, arg_next)))
+                 break
+             yield arg, future.result()
+
 def mkdir(path) :
     if path is None :
        return
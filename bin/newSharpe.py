@@ -32,8 +32,51 @@ As a result, a high Sharpe ratio indicates superior risk-adjusted performance.
 
 '''
 
+class TOP_K(object) :
+      '''
+        Running k highest sharpe and k lowest risk portfolios of a Monte Carlo run
+        Rows are added chunk at a time and only 2 x k are kept, memory is O(k x assets) for any number of portfolios
+        Ties go to the portfolio drawn first, like idxmax / idxmin
+      '''
+      def __init__(self, k, columns) :
+          self.k = k
+          self.columns = columns
+          self.count = 0
+          self.sharpe = (np.empty(0, dtype=np.int64), np.empty((0, len(columns))))
+          self.risk = (np.empty(0, dtype=np.int64), np.empty((0, len(columns))))
+      def __str__(self) :
+          return "top {} of {} portfolios".format(self.k, self.count)
+      def add(self, rows) :
+          '''
+          rows : (n x columns) returns, risk, sharpe, weights
+          '''
+          index = np.arange(self.count, self.count + len(rows))
+          self.count += len(rows)
+          self.sharpe = self._keep(self.sharpe, index, rows, 2, -1)
+          self.risk = self._keep(self.risk, index, rows, 1, 1)
+      def _keep(self, kept, index, rows, column, sign) :
+          index = np.concatenate([kept[0], index])
+          rows = np.vstack([kept[1], rows])
+          order = np.lexsort((index, sign * rows[:, column]))[:self.k]
+          return index[order], rows[order]
+      def frame(self, kept) :
+          index, rows = kept
+          return pd.DataFrame(rows, index=index, columns=self.columns)
+      def max_sharpe(self) :
+          '''
+          highest sharpe first
+          '''
+          return self.frame(self.sharpe)
+      def min_risk(self) :
+          '''
+          lowest risk first
+          '''
+          return self.frame(self.risk)
+
 class PORTFOLIO :
       columns = ['returns','risk','sharpe']
+      chunk = 5000
+      low = 0.1
 
       @classmethod
       def validate(cls, data, **kwargs) :
@@ -92,12 +135,32 @@ class PORTFOLIO :
           logging.info(ret)
           return ret
       @classmethod
-      def _weights(cls, size, num_portfolios) :
-          low = 0.1
+      def random(cls, seed=None) :
+          '''
+          seed : None draws from numpy's global random state
+                 an int or a SeedSequence gets its own Generator, the same seed draws the same portfolios
+          '''
+          if seed is None :
+             return np.random
+          return np.random.default_rng(seed)
+      @classmethod
+      def seeds(cls, seed=None) :
+          '''
+          independent child seeds of seed, one per task in task order (SeedSequence.spawn)
+          a task gets the same stream whichever process runs it
+          '''
+          if not isinstance(seed, np.random.SeedSequence) :
+             seed = np.random.SeedSequence(seed)
+          logging.info('seed entropy {} {}'.format(seed.entropy, seed.spawn_key))
+          while True :
+              yield seed.spawn(1)[0]
+      @classmethod
+      def _weights(cls, size, num_portfolios, random=np.random) :
+          low = cls.low
           high = low + low + (1/size) 
           for i in xrange(num_portfolios):
               #select random weights for portfolio holdings
-              weights = np.random.uniform(low=low, high=high, size=size)
+              weights = random.uniform(low=low, high=high, size=size)
               weights = np.array(weights)
               #rebalance weights to sum to 1
               weights /= np.sum(weights)
@@ -119,6 +182,44 @@ class PORTFOLIO :
              sharpe = ( returns - risk_free_rate ) / risk
           return returns, risk, sharpe
 
+      @classmethod
+      def _batch(cls, size, num_portfolios, chunk=None, random=np.random) :
+          '''
+          (rows x size) weight matrices of at most chunk rows
+          the same draws, in the same order, as _weights
+          '''
+          if chunk is None :
+             chunk = cls.chunk
+          low = cls.low
+          high = low + low + (1/size)
+          for i in xrange(0, num_portfolios, chunk) :
+              rows = min(chunk, num_portfolios - i)
+              weights = random.uniform(low=low, high=high, size=(rows, size))
+              #rebalance weights to sum to 1
+              weights /= weights.sum(axis=1)[:, None]
+              yield weights, i
+      @classmethod
+      def bounds(cls, size) :
+          '''
+          lowest and highest weight a stock can get from _weights, draws of low to high rebalanced to sum to 1
+          '''
+          low = cls.low
+          high = low + low + (1/size)
+          lower = low / (low + (size - 1) * high)
+          upper = high / (high + (size - 1) * low)
+          return lower, upper
+      @classmethod
+      def _sharpe_batch(cls, cov_matrix, mean, period, risk_free_rate, weights) :
+          '''
+          _sharpe of every row of weights, one matrix multiply and a row wise quadratic form
+          '''
+          returns = weights.dot(mean) * period
+          variance = np.einsum('ij,ij->i', weights.dot(cov_matrix), weights)
+          risk = np.sqrt(variance) * np.sqrt(period)
+          sharpe = np.zeros(len(risk))
+          np.divide(returns - risk_free_rate, risk, out=sharpe, where=risk != 0)
+          return returns, risk, sharpe
+
       @classmethod
       def transformReturns(cls, returns) :
           ret = FINANCE.findDailyReturns(returns)
@@ -130,7 +231,34 @@ class PORTFOLIO :
           return ret, mean, cov_matrix
 
       @classmethod
-      def _find(cls, data, stocks, num_portfolios, risk_free_rate, period) :
+      def _find(cls, data, stocks, num_portfolios, risk_free_rate, period, seed=None) :
+          '''
+          portfolios are drawn and measured chunk at a time, one row per portfolio
+          '''
+          size = len(stocks)
+          ret = np.zeros((num_portfolios, 3 + size))
+
+          returns, mean, cov_matrix = cls.transformReturns(data)
+          mean = mean.values
+          cov_matrix = cov_matrix.values
+          for weights, i in cls._batch(size, num_portfolios, random=cls.random(seed)) :
+              rows = slice(i, i + len(weights))
+              returns, risk, sharpe = cls._sharpe_batch(cov_matrix, mean, period, risk_free_rate, weights)
+              ret[rows, 0] = returns
+              ret[rows, 1] = risk
+              ret[rows, 2] = sharpe
+              ret[rows, 3:] = weights
+
+          columns = cls.columns + stocks
+          ret = pd.DataFrame(ret, columns=columns)
+          logging.debug(ret.head(3))
+          logging.debug(ret.tail(3))
+          return ret
+      '''
+         one portfolio at a time, the same results as _find for the same random state
+      '''
+      @classmethod
+      def _alt_find(cls, data, stocks, num_portfolios, risk_free_rate, period, seed=None) :
 
           #set up array to hold results
           #We have increased the size of the array to hold the weight values for each stock
@@ -138,7 +266,7 @@ class PORTFOLIO :
           ret = np.zeros((3+size,num_portfolios))
 
           returns, mean, cov_matrix = cls.transformReturns(data)
-          for weights, i in cls._weights(size, num_portfolios) :
+          for weights, i in cls._weights(size, num_portfolios, cls.random(seed)) :
               returns, risk, sharpe = cls._sharpe(cov_matrix, mean, period, risk_free_rate, weights)
               #store results in results array
               ret[0,i] = returns
@@ -154,22 +282,182 @@ class PORTFOLIO :
           logging.debug(ret.tail(3))
           return ret
 
+      @classmethod
+      def _stream(cls, data, stocks, num_portfolios, risk_free_rate, period, k=1, seed=None) :
+          '''
+          same portfolios as _find, only the TOP_K of them are kept
+          '''
+          size = len(stocks)
+          ret = TOP_K(k, cls.columns + stocks)
+          returns, mean, cov_matrix = cls.transformReturns(data)
+          mean = mean.values
+          cov_matrix = cov_matrix.values
+          for weights, i in cls._batch(size, num_portfolios, random=cls.random(seed)) :
+              returns, risk, sharpe = cls._sharpe_batch(cov_matrix, mean, period, risk_free_rate, weights)
+              ret.add(np.column_stack([returns, risk, sharpe, weights]))
+          logging.debug(str(ret))
+          return ret
+
       @classmethod
       def find(cls, data, **kwargs) :
+          '''
+          method : montecarlo - best of portfolios random draws
+                   frontier - exact portfolios from FRONTIER, bounds (lower, upper) default to PORTFOLIO.bounds
+          '''
           data, stocks, num_portfolios, risk_free_rate, period = cls.validate(data, **kwargs)
           if data is None :
               return pd.DataFrame(), pd.DataFrame()
 
-          ret = cls._find(data, stocks, num_portfolios, risk_free_rate, period)
+          target = "method"
+          method = kwargs.get(target,"montecarlo")
+          if method == "frontier" :
+             target = "bounds"
+             bounds = kwargs.get(target,None)
+             return FRONTIER.find(data, stocks, risk_free_rate, period, bounds)
+          target = "seed"
+          seed = kwargs.get(target,None)
+          ret = cls._stream(data, stocks, num_portfolios, risk_free_rate, period, seed=seed)
+
+          #portfolio with highest Sharpe Ratio
+          max_sharpe_port = ret.max_sharpe().iloc[0]
+
+          #portfolio with minimum risk
+          min_vol_port = ret.min_risk().iloc[0]
+          return max_sharpe_port, min_vol_port
+      @classmethod
+      def top(cls, data, k=50, **kwargs) :
+          '''
+          k highest sharpe and k lowest risk portfolios, one per row, best first
+          '''
+          data, stocks, num_portfolios, risk_free_rate, period = cls.validate(data, **kwargs)
+          if data is None :
+              return pd.DataFrame(), pd.DataFrame()
+          target = "seed"
+          seed = kwargs.get(target,None)
+          ret = cls._stream(data, stocks, num_portfolios, risk_free_rate, period, k, seed)
+          return ret.max_sharpe(), ret.min_risk()
+
+class FRONTIER(object) :
+      '''
+        Exact long only portfolios of the efficient frontier, one quadratic program per subset instead of PORTFOLIO's random draws
+        Weights are boxed, lower <= w <= upper and sum(w) = 1, by default the range of PORTFOLIO._weights
+
+        min_variance : min w'Cw
+        tangency : max sharpe, solved as min y'Cy with e'y = 1 and lower sum(y) <= y <= upper sum(y), then w = y / sum(y)
+                   e is the excess return of each stock, the box scales with y so w stays inside it
+        qp : primal active set method (Nocedal & Wright 16.3), a handful of small linear solves for a portfolio sized problem
+      '''
+      tolerance = 1e-10
 
-          #locate position of portfolio with highest Sharpe Ratio
-          max_sharpe = ret['sharpe'].idxmax()
-          max_sharpe_port = ret.iloc[max_sharpe]
+      @classmethod
+      def qp(cls, Q, c, A_eq, b_eq, A_in, b_in, x) :
+          '''
+          min x'Qx/2 + c'x with A_eq x = b_eq, A_in x >= b_in, starting from a feasible x
+          '''
+          size = len(x)
+          work = []
+          for i in xrange(10 * (size + len(b_in))) :
+              A = np.vstack([A_eq, A_in[work]])
+              m = len(A)
+              kkt = np.block([[Q, -A.T], [A, np.zeros((m, m))]])
+              rhs = np.concatenate([-(Q.dot(x) + c), np.zeros(m)])
+              solve = np.linalg.lstsq(kkt, rhs, rcond=None)[0]
+              p = solve[:size]
+              multiplier = solve[size + len(A_eq):]
+              if np.abs(p).max() <= cls.tolerance * max(1, np.abs(x).max()) :
+                 if len(work) == 0 or multiplier.min() >= -cls.tolerance :
+                    return x
+                 #drop the constraint that holds the objective back the most
+                 del work[int(np.argmin(multiplier))]
+                 continue
+              slope = A_in.dot(p)
+              blocking = [ j for j in xrange(len(b_in)) if j not in work and slope[j] < -cls.tolerance ]
+              step = 1.0
+              block = None
+              for j in blocking :
+                  ratio = max(0.0, (b_in[j] - A_in[j].dot(x)) / slope[j])
+                  if ratio < step :
+                     step, block = ratio, j
+              x = x + step * p
+              if block is not None :
+                 work.append(block)
+          logging.warning('active set did not converge in {} iterations'.format(i + 1))
+          return x
+      @classmethod
+      def box(cls, size, lower, upper) :
+          '''
+          lower <= w <= upper as A_in w >= b_in
+          '''
+          eye = np.eye(size)
+          A_in = np.vstack([eye, -eye])
+          b_in = np.concatenate([np.full(size, lower), np.full(size, -upper)])
+          return A_in, b_in
+      @classmethod
+      def greedy(cls, excess, lower, upper) :
+          '''
+          highest excess return in the box, everything above lower goes to the best stocks first
+          '''
+          ret = np.full(len(excess), lower)
+          left = 1 - ret.sum()
+          for i in np.argsort(-excess, kind='stable') :
+              ret[i] += min(upper - lower, left)
+              left -= ret[i] - lower
+          return ret
+      @classmethod
+      def min_variance(cls, cov_matrix, lower, upper) :
+          size = len(cov_matrix)
+          Q = cov_matrix / np.diag(cov_matrix).mean()
+          A_in, b_in = cls.box(size, lower, upper)
+          x = np.full(size, 1.0 / size)
+          return cls.qp(Q, np.zeros(size), np.ones((1, size)), np.ones(1), A_in, b_in, x)
+      @classmethod
+      def tangency(cls, cov_matrix, excess, lower, upper) :
+          size = len(cov_matrix)
+          start = cls.greedy(excess, lower, upper)
+          if excess.dot(start) <= 0 :
+             return None
+          excess = excess / np.abs(excess).max()
+          Q = cov_matrix / np.diag(cov_matrix).mean()
+          ones = np.ones((size, size))
+          eye = np.eye(size)
+          A_in = np.vstack([eye - lower * ones, upper * ones - eye])
+          x = start / excess.dot(start)
+          ret = cls.qp(Q, np.zeros(size), excess[None, :], np.ones(1), A_in, np.zeros(2 * size), x)
+          return ret / ret.sum()
 
-          #locate positon of portfolio with minimum risk
-          min_vol = ret['risk'].idxmin()
-          min_vol_port = ret.iloc[min_vol]
-          return max_sharpe_port, min_vol_port
+      @classmethod
+      def portfolio(cls, cov_matrix, mean, period, risk_free_rate, weights, stocks, name) :
+          returns, risk, sharpe = PORTFOLIO._sharpe_batch(cov_matrix, mean, period, risk_free_rate, weights[None, :])
+          values = np.concatenate([returns, risk, sharpe, weights])
+          return pd.Series(values, index=PORTFOLIO.columns + list(stocks), name=name)
+      @classmethod
+      def find(cls, data, stocks, risk_free_rate, period, bounds=None) :
+          '''
+          returns max sharpe and min risk portfolios, laid out like PORTFOLIO.find
+          '''
+          size = len(stocks)
+          if bounds is None :
+             bounds = PORTFOLIO.bounds(size)
+          lower, upper = bounds
+          if lower * size > 1 or upper * size < 1 :
+             logging.warning('no weights within {} sum to 1'.format(bounds))
+             return pd.DataFrame(), pd.DataFrame()
+          returns, mean, cov_matrix = PORTFOLIO.transformReturns(data)
+          mean = mean.values
+          cov_matrix = cov_matrix.values
+          min_risk = cls.min_variance(cov_matrix, lower, upper)
+          max_sharpe = cls.tangency(cov_matrix, mean * period - risk_free_rate, lower, upper)
+          min_risk = cls.portfolio(cov_matrix, mean, period, risk_free_rate, min_risk, stocks, 'min_risk')
+          if max_sharpe is None :
+             #no portfolio beats the risk free rate, sharpe is no longer concave, settle for the better of two candidates
+             logging.warning('no portfolio of {} beats the risk free rate'.format(stocks))
+             max_sharpe = cls.greedy(mean, lower, upper)
+             max_sharpe = cls.portfolio(cov_matrix, mean, period, risk_free_rate, max_sharpe, stocks, 'max_sharpe')
+             if max_sharpe['sharpe'] < min_risk['sharpe'] :
+                max_sharpe = min_risk.rename('max_sharpe')
+             return max_sharpe, min_risk
+          max_sharpe = cls.portfolio(cov_matrix, mean, period, risk_free_rate, max_sharpe, stocks, 'max_sharpe')
+          return max_sharpe, min_risk
 
 if __name__ == "__main__" :
 
@@ -0,0 +1,235 @@
+#!/usr/bin/python
+
+'''
+  Benchmark of the libFinance transforms on synthetic prices, run from test/ :
+      python bench_Finance.py               time every transform, compare with the baseline
+      python bench_Finance.py --save        time every transform and record it as the baseline
+      python bench_Finance.py 1 100         only these ticker counts (default 1 100 10000)
+      newSharpe.PORTFOLIO Monte Carlo searches are timed per portfolio, for portfolio_list portfolios of 5 stocks
+
+  GBM - geometric brownian motion price histories, varied lengths and start dates, with gaps
+      - seeded, every run and every machine times the same prices
+  BENCH - seconds per ticker of each transform, best of repeat samples, called once per ticker like libBackground does
+        - libMetrics.BACKGROUND is the stream the scrapers run, libMetrics.BACKGROUND.find measures the universe aligned in one matrix
+          both are divided by the ticker count
+        - a transform slower than tolerance x its baseline is reported as a regression, exit code 1
+        - so is a fast path that is no longer factor x faster than the path it replaces (faster)
+'''
+import json
+import logging
+import platform
+import sys
+import time
+import numpy as np
+import pandas as pd
+import context
+
+from libFinance import HELPER, TRANSFORM_SHARPE, TRANSFORM_CAGR, TRANSFORM_CAGR_SEGMENTS, TRANSFORM_DRAWDOWN, TRANSFORM_BACKGROUND
+from libMetrics import BACKGROUND
+from libStore import CALENDAR
+from newSharpe import PORTFOLIO
+
+class GBM() :
+    mu = 0.08
+    sigma = 0.3
+    longest = 10 * HELPER.YEAR
+    calendar = pd.bdate_range('2010-01-04', periods=longest, name='Date')
+
+    @classmethod
+    def make(cls, periods, start=0, gaps=0, random=None) :
+        '''
+        one ticker, periods prices starting start days into the calendar, gaps days missing
+        drift and volatility are drawn around mu and sigma
+        '''
+        if random is None :
+           random = np.random.RandomState(0)
+        dt = 1.0 / HELPER.YEAR
+        mu = random.normal(cls.mu, 0.05)
+        sigma = cls.sigma * random.uniform(0.5, 1.5)
+        steps = (mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * random.standard_normal(periods)
+        prices = 100 * np.exp(np.cumsum(steps))
+        ret = pd.DataFrame({'Adj Close' : prices}, index=cls.calendar[start:start + periods])
+        if gaps > 0 :
+           ret = ret.drop(ret.index[random.choice(np.arange(1, periods), gaps, replace=False)])
+        return ret
+    @classmethod
+    def universe(cls, count, seed=0) :
+        '''
+        ticker -> prices, from a month to the full calendar long, up to 1% of days missing
+        '''
+        random = np.random.RandomState(seed)
+        ret = {}
+        for i in range(count) :
+            periods = random.randint(HELPER.MONTH, cls.longest + 1)
+            start = random.randint(0, cls.longest - periods + 1)
+            gaps = random.randint(0, periods // 100 + 1)
+            ret['T{:05d}'.format(i)] = cls.make(periods, start, gaps, random)
+        return ret
+
+class BENCH() :
+    size_list = [1, 100, 10000]
+    repeat = 5
+    sample = 0.2
+    tolerance = 1.5
+    baseline = 'testConfig/bench_Finance.json'
+    portfolio_list = [5000]
+    # (fast, slow, factor)
+    faster = [ ('TRANSFORM_BACKGROUND', 'TRANSFORM_BACKGROUND.alt_find', 1)
+             , ('newSharpe.PORTFOLIO._find', 'newSharpe.PORTFOLIO._alt_find', 10) ]
+
+    @classmethod
+    def sharpe(cls, data) :
+        data, risk_free_rate, period, span, size = TRANSFORM_SHARPE.validate(data[['Adj Close']])
+        return TRANSFORM_SHARPE.find(data, risk_free_rate, period, span, size)
+    @classmethod
+    def cagr(cls, data) :
+        growth, periods = TRANSFORM_CAGR.validate(data['Adj Close'])
+        return TRANSFORM_CAGR.find(growth, periods)
+    @classmethod
+    def segments(cls, data) :
+        return TRANSFORM_CAGR_SEGMENTS.find(data['Adj Close'])
+    @classmethod
+    def drawdown(cls, data) :
+        return TRANSFORM_DRAWDOWN.find(TRANSFORM_DRAWDOWN.validate(data['Adj Close']))
+    @classmethod
+    def transforms(cls) :
+        return [ ('TRANSFORM_SHARPE', cls.sharpe)
+               , ('TRANSFORM_CAGR', cls.cagr)
+               , ('TRANSFORM_CAGR_SEGMENTS', cls.segments)
+               , ('TRANSFORM_DRAWDOWN', cls.drawdown)
+               , ('TRANSFORM_BACKGROUND', TRANSFORM_BACKGROUND.find)
+               , ('TRANSFORM_BACKGROUND.alt_find', TRANSFORM_BACKGROUND.alt_find) ]
+
+    @classmethod
+    def best(cls, action, repeat) :
+        '''
+        seconds per action, best of repeat samples of at least sample seconds each
+        '''
+        # the transforms warn per call, keep that out of the timings
+        logging.disable(logging.WARNING)
+        start = time.perf_counter()
+        action()
+        number = int(np.ceil(cls.sample / max(time.perf_counter() - start, 1e-6)))
+        ret = []
+        for i in range(repeat) :
+            start = time.perf_counter()
+            for j in range(number) :
+                action()
+            ret.append((time.perf_counter() - start) / number)
+        logging.disable(logging.NOTSET)
+        return min(ret)
+    @classmethod
+    def run(cls, size_list=None) :
+        '''
+        returns transform -> ticker count -> seconds per ticker
+        '''
+        if size_list is None :
+           size_list = cls.size_list
+        ret = {}
+        for size in size_list :
+            data = list(GBM.universe(size).items())
+            repeat = cls.repeat if size < 1000 else 2
+            for name, transform in cls.transforms() :
+                action = lambda : [ transform(prices) for ticker, prices in data ]
+                ret.setdefault(name, {})[str(size)] = cls.best(action, repeat) / size
+            action = lambda : list(BACKGROUND.stream(data))
+            ret.setdefault('libMetrics.BACKGROUND', {})[str(size)] = cls.best(action, repeat) / size
+            name_list, values = CALENDAR().matrix(dict((ticker, prices['Adj Close']) for ticker, prices in data))
+            prices = pd.DataFrame(values, columns=name_list)
+            action = lambda : BACKGROUND.find(prices)
+            ret.setdefault('libMetrics.BACKGROUND.find', {})[str(size)] = cls.best(action, repeat) / size
+            for name in ret :
+                logging.info('{:>30} {:>6} tickers : {:9.3f} ms per ticker'.format(name, size, ret[name][str(size)] * 1000))
+        ret.update(cls.portfolio())
+        return ret
+    @classmethod
+    def portfolio(cls) :
+        '''
+        returns search -> portfolio count -> seconds per portfolio
+        '''
+        prices = dict(('T{}'.format(i), GBM.make(2 * HELPER.YEAR, random=np.random.RandomState(i))['Adj Close']) for i in range(5))
+        prices = pd.DataFrame(prices)
+        ret = {}
+        for portfolios in cls.portfolio_list :
+            data, stocks, portfolios, risk_free_rate, period = PORTFOLIO.validate(prices, stocks=list(prices.columns), portfolios=portfolios)
+            for name in ['_find', '_alt_find'] :
+                search = getattr(PORTFOLIO, name)
+                action = lambda : search(data, stocks, portfolios, risk_free_rate, period, 7)
+                repeat = cls.repeat if name == '_find' else 1
+                name = 'newSharpe.PORTFOLIO.{}'.format(name)
+                ret.setdefault(name, {})[str(portfolios)] = cls.best(action, repeat) / portfolios
+                logging.info('{:>30} {:>6} portfolios : {:9.3f} us per portfolio'.format(name, portfolios, ret[name][str(portfolios)] * 1e6))
+        return ret
+
+    @classmethod
+    def environment(cls) :
+        return { 'python' : platform.python_version(), 'numpy' : np.__version__, 'pandas' : pd.__version__
+               , 'machine' : platform.machine(), 'processor' : platform.processor() }
+    @classmethod
+    def save(cls, results, filename=None) :
+        if filename is None :
+           filename = cls.baseline
+        ret = { 'environment' : cls.environment(), 'results' : results }
+        with open(filename, 'w') as fp :
+             json.dump(ret, fp, sort_keys=True, indent=1)
+        logging.info('baseline saved to {}'.format(filename))
+    @classmethod
+    def load(cls, filename=None) :
+        if filename is None :
+           filename = cls.baseline
+        with open(filename) as fp :
+             ret = json.load(fp)
+        if ret['environment'] != cls.environment() :
+           logging.warning('baseline recorded on {}'.format(ret['environment']))
+        return ret['results']
+    @classmethod
+    def compare(cls, results, baseline, tolerance=None) :
+        '''
+        returns (transform, ticker count, seconds, baseline seconds) of every regression
+        '''
+        if tolerance is None :
+           tolerance = cls.tolerance
+        ret = []
+        for name in sorted(results) :
+            for size in sorted(results[name], key=int) :
+                then = baseline.get(name, {}).get(size, None)
+                if then is None :
+                   continue
+                now = results[name][size]
+                logging.info('{:>30} {:>6} : {:5.2f} x baseline'.format(name, size, now / then))
+                if now > tolerance * then :
+                   ret.append((name, size, now, then))
+        return ret
+    @classmethod
+    def ordering(cls, results) :
+        '''
+        returns (fast, slow, ticker count, speedup) of every fast path below its factor
+        '''
+        ret = []
+        for fast, slow, factor in cls.faster :
+            for size in sorted(results.get(fast, {}), key=int) :
+                if size not in results.get(slow, {}) :
+                   continue
+                speedup = results[slow][size] / results[fast][size]
+                logging.info('{:>30} {:>6} : {:5.1f} x faster than {}'.format(fast, size, speedup, slow))
+                if speedup < factor :
+                   ret.append((fast, slow, size, speedup))
+        return ret
+
+if __name__ == '__main__' :
+
+   log_msg = '%(module)s.%(funcName)s(%(lineno)s) %(levelname)s - %(message)s'
+   logging.basicConfig(stream=sys.stdout, format=log_msg, level=logging.INFO)
+
+   size_list = [ int(arg) for arg in sys.argv[1:] if arg.isdigit() ]
+   results = BENCH.run(size_list or None)
+   ordering = BENCH.ordering(results)
+   for fast, slow, size, speedup in ordering :
+       logging.error('{} at {} : only {:.1f} x faster than {}'.format(fast, size, speedup, slow))
+   if '--save' in sys.argv :
+      BENCH.save(results)
+      sys.exit(len(ordering) > 0)
+   regression = BENCH.compare(results, BENCH.load())
+   for name, size, now, then in regression :
+       logging.error('{} at {} : {:.3f} ms per unit, baseline {:.3f} ms'.format(name, size, now * 1000, then * 1000))
+   sys.exit(len(regression) + len(ordering) > 0)
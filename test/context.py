@@ -3,6 +3,8 @@ import os
 import sys
 import re
 import logging
+import numpy as np
+import pandas as pd
 '''
 import inspect
 _cf = inspect.currentframe()
@@ -19,6 +21,19 @@ def add_context(arg=None) :
 
 add_context()
 
+def make_prices(stock_list, periods, start='2018-01-01', seed=0, mu=0.0005, sigma=0.015, gaps=0) :
+    '''
+    synthetic (dates x stock_list) prices on a business day calendar from start, daily returns normal(mu, sigma)
+    gaps : rows dropped at random (never the first), drawn after the returns from the same seed
+    '''
+    random = np.random.RandomState(seed)
+    dates = pd.bdate_range(start, periods=periods, name='Date')
+    daily = random.normal(mu, sigma, (periods, len(stock_list)))
+    ret = pd.DataFrame(100 * np.cumprod(1 + daily, axis=0), index=dates, columns=stock_list)
+    if gaps > 0 :
+       ret = ret.drop(ret.index[random.choice(np.arange(1, periods), gaps, replace=False)])
+    return ret
+
 log_file = 'testResults/tests.log'
 log_msg = '%(module)s.%(funcName)s(%(lineno)s) %(levelname)s - %(message)s'
 
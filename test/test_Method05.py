@@ -0,0 +1,51 @@
+#!/usr/bin/python
+
+import logging
+import unittest
+import numpy as np
+import pandas as pd
+import context
+
+from context import make_prices
+from cmd_Method05 import STEP_03
+
+class T() :
+    stock_list = ['AAPL', 'IBM', 'SPY', 'XOM', 'GE', 'KO']
+    prices = make_prices(stock_list, 300)
+    data = pd.DataFrame({'RISK' : np.arange(6.0), 'returns' : 0.0}, index=stock_list)
+    @classmethod
+    def subsets(cls, ret) :
+        ret = ret.drop(['returns','risk','sharpe'])
+        return [ sorted(ret.index[ret[column] > 0]) for column in ret ]
+
+class TEST_01_STEP_03(unittest.TestCase):
+
+    def test_01_sequential(self) :
+        step = STEP_03(500, ['returns','risk','sharpe','mean'])
+        subsets = [ sorted(x) for x in step.stocks(T.data) ]
+        ret = step.act(T.data, T.prices)
+        self.assertEqual(ret.shape[1], 2 * len(subsets))
+        self.assertEqual(T.subsets(ret)[::2], subsets)
+    def test_02_workers(self) :
+        step = STEP_03(500, ['returns','risk','sharpe','mean'], workers=2)
+        subsets = [ sorted(x) for x in step.stocks(T.data) ]
+        ret = step.act(T.data, T.prices)
+        self.assertEqual(ret.shape[1], 2 * len(subsets))
+        self.assertEqual(T.subsets(ret)[::2], subsets)
+        self.assertEqual(T.subsets(ret)[1::2], subsets)
+        weights = ret.drop(['returns','risk','sharpe'])
+        np.testing.assert_allclose(weights.sum().values, 1)
+        self.assertEqual(ret.loc['sharpe'].nunique(), ret.shape[1])
+    def test_03_seed(self) :
+        ret = STEP_03(500, ['returns','risk','sharpe','mean'], seed=5).act(T.data, T.prices)
+        test = STEP_03(500, ['returns','risk','sharpe','mean'], workers=2, seed=5).act(T.data, T.prices)
+        pd.testing.assert_frame_equal(ret, test)
+
+if __name__ == '__main__' :
+
+   import sys
+
+   log_msg = '%(module)s.%(funcName)s(%(lineno)s) %(levelname)s - %(message)s'
+   logging.basicConfig(stream=sys.stdout, format=log_msg, level=logging.INFO)
+
+   unittest.main()
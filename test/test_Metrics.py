@@ -0,0 +1,433 @@
+#!/usr/bin/python
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import context
+
+from libFinance import STOCK_TIMESERIES, TRANSFORM_BACKGROUND, TRANSFORM_CAGR_SEGMENTS
+from libMetrics import BACKGROUND, DRAWDOWN, SWEEP, ONLINE, ROLLING, RISK, GROWTH
+from cmd_Scrape_Benchmarks import extended
+
+def make_prices(periods, start=0, seed=0, gaps=0) :
+    '''
+    one ticker on a business day calendar, starting start days in, with gaps missing days
+    '''
+    start = pd.bdate_range('2012-01-02', periods=start + 1)[start]
+    ret = context.make_prices(['Adj Close'], periods, start, seed, sigma=0.02, gaps=gaps)
+    return ret['Adj Close']
+
+class T() :
+    prices = { 'AAPL' : make_prices(2520, 0, 1)
+             , 'IBM' : make_prices(1500, 700, 2, gaps=7)
+             , 'NEW' : make_prices(40, 2400, 3)
+             , 'ONE' : make_prices(1, 100, 4)
+             , 'TWO' : make_prices(2, 100, 5) }
+    @classmethod
+    def frame(cls) :
+        return pd.DataFrame(cls.prices)
+    @classmethod
+    def single(cls, ticker) :
+        return pd.DataFrame({'Adj Close' : cls.prices[ticker]})
+
+class METRICS(unittest.TestCase):
+    def assertEntry(self, ret, test) :
+        self.assertEqual(sorted(ret), sorted(test))
+        for key in test :
+            if np.isnan(test[key]) :
+               self.assertTrue(np.isnan(ret[key]), key)
+               continue
+            self.assertAlmostEqual(ret[key], test[key], places=3, msg=key)
+
+class TEST_01_BACKGROUND(METRICS):
+
+    def test_01_find(self) :
+        ret = BACKGROUND.find(T.frame())
+        for ticker in T.prices :
+            test = TRANSFORM_BACKGROUND.find(T.single(ticker))
+            self.assertEntry(ret[ticker], test)
+    def test_02_kwargs(self) :
+        kwargs = { 'span' : 0, 'period' : 252, 'risk_free_rate' : 0.01 }
+        ret = BACKGROUND.find(T.frame(), **kwargs)
+        test = TRANSFORM_BACKGROUND.find(T.single('IBM'), **kwargs)
+        self.assertEntry(ret['IBM'], test)
+    def test_03_len(self) :
+        ret = BACKGROUND.find(T.frame())
+        self.assertEqual(ret['IBM']['LEN'], 1493)
+        ret = BACKGROUND.find(T.frame(), size=[1, 2, 3, 4, 5])
+        self.assertEqual([ ret[x]['LEN'] for x in T.prices ], [1, 2, 3, 4, 5])
+    def test_04_stream(self) :
+        data = [ (ticker, T.single(ticker)) for ticker in T.prices ]
+        ret = list(BACKGROUND.stream(data))
+        self.assertEqual([ x[0] for x in ret ], list(T.prices))
+        for ticker, entry in ret :
+            self.assertEntry(entry, TRANSFORM_BACKGROUND.find(T.single(ticker)))
+        data = T.single('IBM')
+        data['daily'] = data['Adj Close'].pct_change() * 2
+        ret = dict(BACKGROUND.stream([('IBM', data)]))
+        self.assertEntry(ret['IBM'], TRANSFORM_BACKGROUND.alt_find(data))
+    def test_05_gaps(self) :
+        data = T.single('AAPL').iloc[:300].copy()
+        data.iloc[100:160] = np.nan
+        kwargs = { 'period' : 252 }
+        test = TRANSFORM_BACKGROUND.find(data, **kwargs)
+        self.assertNotEqual(test['SHARPE'], 0)
+        ret = BACKGROUND.find(data[['Adj Close']], size=[300], **kwargs)
+        self.assertEntry(ret['Adj Close'], test)
+        ret = dict(BACKGROUND.stream([('AAPL', data)], **kwargs))
+        self.assertEntry(ret['AAPL'], test)
+        ret = SWEEP.find(data[['Adj Close']], [504], size=[300], **kwargs)
+        self.assertAlmostEqual(ret['SHARPE'].iloc[0, 0], test['SHARPE'], places=3)
+
+class TEST_02_FUSED(METRICS):
+
+    def test_01_find(self) :
+        for ticker in T.prices :
+            data = T.single(ticker)
+            self.assertEntry(TRANSFORM_BACKGROUND.find(data), TRANSFORM_BACKGROUND.alt_find(data))
+        data = T.single('IBM')
+        data['daily'] = data['Adj Close'].pct_change()
+        self.assertEntry(TRANSFORM_BACKGROUND.find(data), TRANSFORM_BACKGROUND.alt_find(data))
+
+class TEST_03_ONLINE(METRICS):
+    def setUp(self) :
+        self.local_dir = tempfile.mkdtemp()
+        self.prices = T.prices['AAPL']
+    def tearDown(self) :
+        shutil.rmtree(self.local_dir)
+
+    def test_01_advance(self) :
+        ret = ONLINE.rebuild('AAPL', self.prices.iloc[:2000])
+        for end in [2001, 2010, 2520] :
+            ret.advance(self.prices.iloc[:end])
+            test = TRANSFORM_BACKGROUND.find(pd.DataFrame({'Adj Close' : self.prices.iloc[:end]}))
+            self.assertEntry(ret.find(), test)
+        self.assertEqual(ret.count, 2520)
+    def test_02_update(self) :
+        ret = ONLINE('AAPL', 0)
+        for date, price in self.prices.iloc[:300].items() :
+            ret.update(date, price)
+        ret.size = 300
+        test = TRANSFORM_BACKGROUND.find(pd.DataFrame({'Adj Close' : self.prices.iloc[:300]}), span=0)
+        self.assertEntry(ret.find(span=0), test)
+    def test_03_stale(self) :
+        ret = ONLINE.rebuild('AAPL', self.prices.iloc[:2000])
+        self.assertFalse(ret.stale(self.prices.iloc[10:2100]))
+        self.assertTrue(ret.stale(self.prices.iloc[100:2100]))
+        restated = self.prices.iloc[:2100] * 1.0
+        restated.iloc[1999] *= 1.1
+        self.assertTrue(ret.stale(restated))
+        ret.advance(restated)
+        self.assertEntry(ret.find(), TRANSFORM_BACKGROUND.find(pd.DataFrame({'Adj Close' : restated})))
+    def save(self, end=None) :
+        for ticker in T.prices :
+            STOCK_TIMESERIES.save('{}/{}.pkl'.format(self.local_dir, ticker), ticker, T.single(ticker).iloc[:end])
+    def test_04_stream(self) :
+        self.save(-5)
+        list(ONLINE.stream(self.local_dir, list(T.prices)))
+        self.save()
+        ret = dict(ONLINE.stream(self.local_dir, list(T.prices) + ['MISSING']))
+        self.assertEqual(sorted(ONLINE.load(self.local_dir)), sorted(T.prices))
+        for ticker in T.prices :
+            self.assertEntry(ret[ticker], TRANSFORM_BACKGROUND.find(T.single(ticker)))
+    def test_05_tail(self) :
+        self.save(-5)
+        list(ONLINE.stream(self.local_dir, list(T.prices)))
+        self.save()
+        STOCK_TIMESERIES.manifest(self.local_dir)
+        start_list = []
+        load = STOCK_TIMESERIES.load
+        def spy(filename, start=None, **kwargs) :
+            start_list.append(start)
+            return load(filename, start=start, **kwargs)
+        STOCK_TIMESERIES.load = spy
+        try :
+           ret = dict(ONLINE.stream(self.local_dir, ['AAPL', 'IBM']))
+        finally :
+           STOCK_TIMESERIES.load = load
+        state = ONLINE.load(self.local_dir)
+        self.assertEqual(start_list, [ str(T.prices[ticker].index[-6].date()) for ticker in ['AAPL', 'IBM'] ])
+        self.assertEqual(state['AAPL'].last, str(T.prices['AAPL'].index[-1].date()))
+        self.assertEntry(ret['IBM'], TRANSFORM_BACKGROUND.find(T.single('IBM')))
+    def test_06_corrupt(self) :
+        self.save()
+        list(ONLINE.stream(self.local_dir, list(T.prices)))
+        with open('{}/IBM.pkl'.format(self.local_dir), 'r+b') as fp :
+             fp.write(b'corrupt')
+        logging.disable(logging.ERROR)
+        try :
+           ret = dict(ONLINE.stream(self.local_dir, list(T.prices)))
+        finally :
+           logging.disable(logging.NOTSET)
+        self.assertNotIn('IBM', ret)
+        self.assertIn('AAPL', ret)
+        self.assertNotIn('IBM', ONLINE.load(self.local_dir))
+    def test_07_read_error(self) :
+        self.save(-5)
+        list(ONLINE.stream(self.local_dir, list(T.prices)))
+        self.save()
+        load = STOCK_TIMESERIES.load
+        def broken(filename, **kwargs) :
+            if filename.endswith('IBM.pkl') :
+               raise EOFError(filename)
+            return load(filename, **kwargs)
+        STOCK_TIMESERIES.load = broken
+        logging.disable(logging.ERROR)
+        try :
+           ret = dict(ONLINE.stream(self.local_dir, list(T.prices)))
+        finally :
+           STOCK_TIMESERIES.load = load
+           logging.disable(logging.NOTSET)
+        self.assertNotIn('IBM', ret)
+        self.assertIn('AAPL', ret)
+        self.assertNotIn('IBM', ONLINE.load(self.local_dir))
+    def test_08_interrupted(self) :
+        self.save()
+        stream = ONLINE.stream(self.local_dir, list(T.prices))
+        next(stream)
+        stream.close()
+        self.assertEqual(list(ONLINE.load(self.local_dir)), [list(T.prices)[0]])
+        with open(ONLINE.filename(self.local_dir), 'r+') as fp :
+             fp.truncate(20)
+        self.assertEqual(ONLINE.load(self.local_dir), {})
+        ret = dict(ONLINE.stream(self.local_dir, list(T.prices)))
+        self.assertEqual(sorted(ret), sorted(ONLINE.load(self.local_dir)))
+        self.assertEqual([ name for name in os.listdir(self.local_dir) if name.endswith('.tmp') ], [])
+
+class TEST_04_ROLLING(unittest.TestCase):
+
+    def test_01_find(self) :
+        window = 63
+        ret = ROLLING.find(T.frame(), window, period=252)
+        self.assertEqual(sorted(ret), sorted(ROLLING.key_list))
+        prices = T.prices['AAPL']
+        daily = prices.pct_change()
+        test = { 'RETURNS' : daily.rolling(window).mean() * 252
+               , 'RISK' : daily.rolling(window).std() * np.sqrt(252)
+               , 'CAGR' : (prices / prices.shift(window)) ** (252 / window) - 1
+               , 'DRAWDOWN' : prices / prices.rolling(window, min_periods=1).max() - 1 }
+        test['SHARPE'] = (test['RETURNS'] - 0.02) / test['RISK']
+        for key in test :
+            np.testing.assert_allclose(ret[key]['AAPL'].values, test[key].values, rtol=1e-7, atol=1e-10, err_msg=key)
+    def test_02_late_start(self) :
+        ret = ROLLING.find(T.frame(), 21, min_periods=15)
+        for ticker in ['IBM', 'NEW'] :
+            start = T.frame().index.get_loc(T.prices[ticker].index[0])
+            end = T.frame().index.get_loc(T.prices[ticker].index[-1])
+            self.assertTrue(ret['RISK'][ticker].iloc[:start + 15].isnull().all())
+            self.assertFalse(ret['RISK'][ticker].iloc[start + 21:end].isnull().any())
+        self.assertTrue(ret['SHARPE']['ONE'].isnull().all())
+
+class TEST_05_RISK(unittest.TestCase):
+    def setUp(self) :
+        self.ret = RISK.find(T.frame(), 'AAPL')
+        self.daily = T.frame().pct_change()
+        self.market = self.daily['AAPL']
+
+    def test_01_keys(self) :
+        self.assertEqual(sorted(self.ret), sorted(T.prices))
+        for ticker in self.ret :
+            self.assertEqual(list(self.ret[ticker]), RISK.key_list)
+        self.assertAlmostEqual(self.ret['AAPL']['BETA'], 1)
+        self.assertAlmostEqual(self.ret['AAPL']['R2'], 1)
+        self.assertAlmostEqual(self.ret['AAPL']['TRACKING ERROR'], 0)
+    def test_02_single(self) :
+        ret = self.ret['AAPL']
+        daily = self.market
+        self.assertAlmostEqual(ret['MEAN'], daily.mean() * 252, places=3)
+        self.assertAlmostEqual(ret['VOLATILITY'], daily.std() * np.sqrt(252), places=3)
+        self.assertAlmostEqual(ret['HISTORICAL VAR'], daily.sort_values().iloc[int(0.05 * daily.count())], places=3)
+        self.assertAlmostEqual(ret['CVAR'], daily.sort_values().iloc[:int(0.05 * daily.count()) + 1].mean(), places=3)
+        self.assertAlmostEqual(ret['SKEWNESS'], daily.skew(), places=4)
+        self.assertAlmostEqual(ret['EXCESS KURTOSIS'], daily.kurt(), places=4)
+        prices = T.prices['AAPL']
+        self.assertAlmostEqual(ret['DRAWDOWN'], (prices / prices.cummax() - 1).min(), places=3)
+        self.assertAlmostEqual(ret['POSITIVE PERIODS'], (daily > 0).sum() / daily.count(), places=3)
+    def test_03_benchmark(self) :
+        ret = self.ret['IBM']
+        daily = T.prices['IBM'].pct_change().dropna()
+        market = T.prices['AAPL'].reindex(T.prices['IBM'].index).pct_change().dropna()
+        self.assertAlmostEqual(ret['BETA'], daily.cov(market) / market.var(), places=3)
+        self.assertAlmostEqual(ret['CORRELATION'], daily.corr(market), places=3)
+        self.assertAlmostEqual(ret['TRACKING ERROR'], (daily - market).std() * np.sqrt(252), places=3)
+        self.assertAlmostEqual(ret['UPSIDE CAPTURE'], daily[market > 0].mean() / market[market > 0].mean(), places=3)
+    def test_04_empty(self) :
+        ret = self.ret['ONE']
+        self.assertTrue(np.isnan(ret['VOLATILITY']))
+        self.assertTrue(np.isnan(ret['BETA']))
+    def test_05_moments(self) :
+        ret = self.ret['NEW']
+        daily = T.prices['NEW'].pct_change().dropna()
+        self.assertAlmostEqual(ret['SKEWNESS'], daily.skew(), places=4)
+        self.assertAlmostEqual(ret['EXCESS KURTOSIS'], daily.kurt(), places=4)
+        self.assertTrue(np.isnan(self.ret['TWO']['SKEWNESS']))
+        self.assertTrue(np.isnan(self.ret['TWO']['EXCESS KURTOSIS']))
+    def test_06_missing(self) :
+        local_dir = tempfile.mkdtemp()
+        try :
+           for ticker in ['AAPL', 'IBM'] :
+               STOCK_TIMESERIES.save('{}/{}.pkl'.format(local_dir, ticker), ticker, T.single(ticker))
+           logging.disable(logging.ERROR)
+           try :
+              ret = extended(local_dir, ['AAPL', 'IBM', 'MISSING'], 'AAPL')
+              missing = extended(local_dir, ['IBM', 'MISSING'], 'MISSING')
+           finally :
+              logging.disable(logging.NOTSET)
+        finally :
+           shutil.rmtree(local_dir)
+        self.assertEqual(sorted(ret), ['AAPL', 'IBM'])
+        self.assertAlmostEqual(ret['IBM']['BETA'], self.ret['IBM']['BETA'], places=6)
+        self.assertTrue(missing.empty)
+
+class TEST_06_GROWTH(unittest.TestCase):
+    def setUp(self) :
+        self.ret = GROWTH.build(T.frame())
+        self.dates = T.frame().index
+
+    def test_01_growth(self) :
+        start, end = self.dates[800], self.dates[2100]
+        ret = self.ret.growth(start, end)
+        prices = T.frame().ffill()
+        test = prices.loc[end] / prices.loc[start]
+        np.testing.assert_allclose(ret[['AAPL','IBM']].values, test[['AAPL','IBM']].values)
+        self.assertTrue(ret[['NEW','ONE','TWO']].isnull().all())
+        ret = self.ret.cagr(start, end)
+        self.assertAlmostEqual(ret['AAPL'], test['AAPL'] ** (252 / 1300.0) - 1)
+        self.assertTrue(np.isnan(self.ret.growth(self.dates[10], end)['IBM']))
+    def test_02_query(self) :
+        window_list = [ (self.dates[i], self.dates[-1]) for i in [0, 1000, 2000] ]
+        ret = self.ret.query(window_list)
+        self.assertEqual(ret.shape, (len(T.prices), 3))
+        for window in window_list :
+            np.testing.assert_allclose(ret[window].values, self.ret.cagr(*window).values)
+    def test_03_horizons(self) :
+        ret = self.ret.horizons()
+        test = TRANSFORM_CAGR_SEGMENTS.find(T.prices['AAPL'])
+        np.testing.assert_allclose(ret.loc['AAPL'].values, test, atol=1e-4)
+        self.assertTrue(np.isnan(ret.loc['AAPL', 'CAGR 8']) == False)
+        self.assertTrue(np.isnan(ret.loc['NEW', 'CAGR 1']))
+    def test_04_segments(self) :
+        for ticker in ['AAPL', 'IBM'] :
+            test = [ TRANSFORM_CAGR_SEGMENTS.transform(T.prices[ticker], i) for i in [8, 5, 3, 1] ]
+            np.testing.assert_allclose(TRANSFORM_CAGR_SEGMENTS.find(T.prices[ticker]), test, atol=1e-4)
+    def test_05_stored_index(self) :
+        returns = STOCK_TIMESERIES.find_returns(T.single('IBM'))
+        test = TRANSFORM_CAGR_SEGMENTS.find(T.prices['IBM'])
+        self.assertEqual(TRANSFORM_CAGR_SEGMENTS.find(returns), test)
+        ret = TRANSFORM_CAGR_SEGMENTS.enrich(returns, 'IBM')
+        self.assertEqual(list(ret.loc['IBM']), test)
+
+class TEST_07_DRAWDOWN(unittest.TestCase):
+    def walk(self, prices) :
+        '''
+        one price at a time, the way the drawdown is defined
+        '''
+        prices = prices.dropna()
+        top, low, peak, trough = prices.iloc[0], 0.0, None, None
+        for date, price in prices.items() :
+            if price >= top :
+               top, top_date = price, date
+            if price / top - 1 < low :
+               low, peak, trough = price / top - 1, top_date, date
+        recovery = None
+        if trough is not None :
+           later = prices[trough:]
+           later = later[later >= prices[peak]]
+           if len(later) > 0 :
+              recovery = later.index[0]
+        return low, peak, trough, recovery
+
+    def test_01_find(self) :
+        ret = DRAWDOWN.find(T.frame())
+        self.assertEqual(list(ret.columns), DRAWDOWN.key_list)
+        for ticker in ['AAPL', 'IBM', 'NEW', 'TWO'] :
+            prices = T.prices[ticker]
+            low, peak, trough, recovery = self.walk(prices)
+            self.assertAlmostEqual(ret.loc[ticker, 'MAX DRAWDOWN'], low)
+            self.assertAlmostEqual(ret.loc[ticker, 'MAX INCREASE'], (prices / prices.cummin()).max() - 1)
+            self.assertEqual(ret.loc[ticker, 'TROUGH'], trough if trough is not None else pd.NaT)
+            if peak is None :
+               self.assertTrue(pd.isnull(ret.loc[ticker, 'PEAK']))
+               self.assertEqual(ret.loc[ticker, 'DURATION'], 0)
+               continue
+            self.assertEqual(ret.loc[ticker, 'PEAK'], peak)
+            if recovery is None :
+               self.assertTrue(pd.isnull(ret.loc[ticker, 'RECOVERY']))
+               recovery = prices.index[-1]
+            else :
+               self.assertEqual(ret.loc[ticker, 'RECOVERY'], recovery)
+            self.assertEqual(ret.loc[ticker, 'DURATION'], len(prices[peak:recovery]) - 1)
+            self.assertAlmostEqual(ret.loc[ticker, 'UNDER WATER'], (prices < prices.cummax()).mean())
+    def test_02_empty(self) :
+        data = T.frame()
+        data['NONE'] = np.nan
+        ret = DRAWDOWN.find(data)
+        self.assertTrue(ret.loc['NONE'].isnull().all())
+        self.assertEqual(ret.loc['ONE', 'MAX DRAWDOWN'], 0)
+        self.assertEqual(ret.loc['ONE', 'DURATION'], 0)
+    def test_03_background(self) :
+        ret = DRAWDOWN.find(T.frame())
+        for ticker in T.prices :
+            test = TRANSFORM_BACKGROUND.find(T.single(ticker))
+            self.assertAlmostEqual(test['MAX DRAWDOWN'], ret.loc[ticker, 'MAX DRAWDOWN'])
+            self.assertAlmostEqual(test['MAX INCREASE'], ret.loc[ticker, 'MAX INCREASE'])
+
+class TEST_08_SWEEP(unittest.TestCase):
+
+    def test_01_find(self) :
+        span_list = [0, 21, 63, 504]
+        ret = SWEEP.find(T.frame(), span_list)
+        self.assertEqual(sorted(ret), sorted(SWEEP.key_list))
+        for span in span_list :
+            test = BACKGROUND.find(T.frame(), span=span)
+            for ticker in T.prices :
+                for key in SWEEP.key_list :
+                    value, expected = ret[key].loc[ticker, span], test[ticker][key]
+                    if np.isnan(expected) :
+                       self.assertTrue(np.isnan(value), (ticker, span, key))
+                       continue
+                    self.assertAlmostEqual(value, expected, places=3, msg=(ticker, span, key))
+    def test_02_pandas(self) :
+        daily = T.prices['IBM'].pct_change()
+        mean, var, count = SWEEP.moments(daily.values[:, None], daily.notnull().values[:, None], [0, 126])
+        self.assertAlmostEqual(mean[0, 0], daily.mean())
+        self.assertAlmostEqual(var[0, 0], daily.var())
+        self.assertAlmostEqual(mean[1, 0], daily.dropna().ewm(span=126).mean().iloc[-1])
+        self.assertAlmostEqual(var[1, 0], daily.dropna().ewm(span=126).var().iloc[-1])
+        self.assertEqual(count[0], len(daily.dropna()))
+    def test_03_default(self) :
+        ret = SWEEP.find(T.frame(), period=252)
+        test = BACKGROUND.find(T.frame(), period=252)
+        self.assertEqual(list(ret['SHARPE'].columns), [504])
+        self.assertAlmostEqual(ret['SHARPE'].loc['AAPL', 504], test['AAPL']['SHARPE'], places=3)
+
+class TEST_09_FREQUENCY(unittest.TestCase):
+    def setUp(self) :
+        self.prices = T.frame()[['AAPL', 'IBM']].resample('M').last()
+
+    def test_01_background(self) :
+        ret = BACKGROUND.find(self.prices, period=12, year=12)
+        prices = self.prices['AAPL'].dropna()
+        self.assertAlmostEqual(ret['AAPL']['CAGR'], (prices.iloc[-1] / prices.iloc[0]) ** (12.0 / len(prices)) - 1, places=4)
+        test = SWEEP.find(self.prices, [0], period=12)
+        self.assertAlmostEqual(test['RISK'].loc['AAPL', 0], prices.pct_change().std() * np.sqrt(12))
+    def test_02_growth(self) :
+        ret = GROWTH.build(self.prices, 12)
+        test = BACKGROUND.find(self.prices, year=12)
+        start, end = self.prices.index[0], self.prices.index[-1]
+        growth = ret.growth(start, end)['AAPL']
+        self.assertAlmostEqual(growth, test['AAPL']['GROWTH'], places=4)
+        self.assertAlmostEqual(ret.cagr(start, end)['AAPL'], growth ** (12.0 / (len(self.prices) - 1)) - 1)
+
+if __name__ == '__main__' :
+
+   import sys
+
+   log_msg = '%(module)s.%(funcName)s(%(lineno)s) %(levelname)s - %(message)s'
+   logging.basicConfig(stream=sys.stdout, format=log_msg, level=logging.INFO)
+
+   unittest.main()
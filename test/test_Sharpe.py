@@ -0,0 +1,136 @@
+#!/usr/bin/python
+
+import logging
+import unittest
+import numpy as np
+import pandas as pd
+import context
+
+from context import make_prices
+from newSharpe import PORTFOLIO, TOP_K, FRONTIER
+
+class T() :
+    stock_list = ['AAPL', 'IBM', 'SPY', 'XOM', 'GE']
+    prices = make_prices(stock_list, 500)
+    @classmethod
+    def run(cls, method, portfolios, seed=7, *largs) :
+        data, stocks, portfolios, risk_free_rate, period = PORTFOLIO.validate(cls.prices, stocks=cls.stock_list, portfolios=portfolios)
+        np.random.seed(seed)
+        return method(data, stocks, portfolios, risk_free_rate, period, *largs)
+
+class TEST_01_PORTFOLIO(unittest.TestCase):
+
+    def test_01_batch(self) :
+        ret = T.run(PORTFOLIO._find, 12001)
+        test = T.run(PORTFOLIO._alt_find, 12001)
+        self.assertEqual(list(ret.columns), list(test.columns))
+        np.testing.assert_allclose(ret.values, test.values, rtol=1e-10)
+    def test_02_weights(self) :
+        ret = T.run(PORTFOLIO._find, 1000)
+        np.testing.assert_allclose(ret[T.stock_list].sum(axis=1).values, 1)
+        weights = ret[T.stock_list].iloc[17].values
+        mean = T.prices.pct_change().mean()
+        returns, risk, sharpe = PORTFOLIO._sharpe(T.prices.pct_change().cov(), mean, 252, 0.02, weights)
+        self.assertAlmostEqual(ret['sharpe'].iloc[17], sharpe)
+    def test_03_find(self) :
+        np.random.seed(3)
+        max_sharpe, min_vol = PORTFOLIO.find(T.prices, stocks=T.stock_list, portfolios=5000)
+        test = T.run(PORTFOLIO._alt_find, 5000, 3)
+        pd.testing.assert_series_equal(max_sharpe, test.iloc[test['sharpe'].idxmax()])
+        pd.testing.assert_series_equal(min_vol, test.iloc[test['risk'].idxmin()])
+
+class TEST_02_TOP_K(unittest.TestCase):
+
+    def test_01_stream(self) :
+        ret = T.run(PORTFOLIO._stream, 12001, 7, 50)
+        test = T.run(PORTFOLIO._find, 12001)
+        self.assertEqual(ret.count, 12001)
+        pd.testing.assert_frame_equal(ret.max_sharpe(), test.sort_values('sharpe', ascending=False, kind='stable').head(50), check_index_type=False)
+        pd.testing.assert_frame_equal(ret.min_risk(), test.sort_values('risk', kind='stable').head(50), check_index_type=False)
+    def test_02_bounded(self) :
+        ret = TOP_K(3, ['returns', 'risk', 'sharpe', 'A'])
+        random = np.random.RandomState(0)
+        for i in range(20) :
+            ret.add(random.uniform(size=(1000, 4)))
+            self.assertEqual(len(ret.sharpe[1]), 3)
+            self.assertEqual(len(ret.risk[1]), 3)
+        self.assertEqual(ret.count, 20000)
+        self.assertTrue(ret.max_sharpe()['sharpe'].is_monotonic_decreasing)
+        self.assertTrue(ret.min_risk()['risk'].is_monotonic_increasing)
+    def test_03_ties(self) :
+        ret = TOP_K(1, ['returns', 'risk', 'sharpe'])
+        ret.add(np.array([[0, 2, 1], [0, 1, 3]], dtype=float))
+        ret.add(np.array([[0, 1, 3], [0, 5, 0]], dtype=float))
+        self.assertEqual(ret.max_sharpe().index[0], 1)
+        self.assertEqual(ret.min_risk().index[0], 1)
+    def test_04_top(self) :
+        np.random.seed(3)
+        max_sharpe, min_risk = PORTFOLIO.top(T.prices, 5, stocks=T.stock_list, portfolios=5000)
+        self.assertEqual(len(max_sharpe), 5)
+        np.random.seed(3)
+        test = PORTFOLIO.find(T.prices, stocks=T.stock_list, portfolios=5000)
+        pd.testing.assert_series_equal(max_sharpe.iloc[0], test[0])
+        pd.testing.assert_series_equal(min_risk.iloc[0], test[1])
+
+class TEST_03_SEED(unittest.TestCase):
+
+    def test_01_repeat(self) :
+        ret = PORTFOLIO.find(T.prices, stocks=T.stock_list, portfolios=5000, seed=11)
+        np.random.seed(0)
+        test = PORTFOLIO.find(T.prices, stocks=T.stock_list, portfolios=5000, seed=11)
+        pd.testing.assert_series_equal(ret[0], test[0])
+        pd.testing.assert_series_equal(ret[1], test[1])
+        test = PORTFOLIO.find(T.prices, stocks=T.stock_list, portfolios=5000, seed=12)
+        self.assertNotEqual(ret[0]['sharpe'], test[0]['sharpe'])
+    def test_02_batch(self) :
+        ret = T.run(PORTFOLIO._find, 12001, 7, 11)
+        test = T.run(PORTFOLIO._alt_find, 12001, 7, 11)
+        np.testing.assert_allclose(ret.values, test.values, rtol=1e-10)
+    def test_03_seeds(self) :
+        ret = [ seed.generate_state(4) for seed, i in zip(PORTFOLIO.seeds(5), range(3)) ]
+        test = [ seed.generate_state(4) for seed, i in zip(PORTFOLIO.seeds(np.random.SeedSequence(5)), range(3)) ]
+        np.testing.assert_array_equal(ret, test)
+        self.assertEqual(len(set(tuple(x) for x in ret)), 3)
+
+class TEST_04_FRONTIER(unittest.TestCase):
+
+    def test_01_montecarlo(self) :
+        max_sharpe, min_risk = PORTFOLIO.find(T.prices, stocks=T.stock_list, method='frontier')
+        test = PORTFOLIO.find(T.prices, stocks=T.stock_list, portfolios=25000, seed=1)
+        self.assertGreaterEqual(max_sharpe['sharpe'], test[0]['sharpe'])
+        self.assertLessEqual(min_risk['risk'], test[1]['risk'])
+        self.assertEqual(list(max_sharpe.index), list(test[0].index))
+        lower, upper = PORTFOLIO.bounds(len(T.stock_list))
+        for weights in [max_sharpe[T.stock_list], min_risk[T.stock_list]] :
+            self.assertAlmostEqual(weights.sum(), 1)
+            self.assertTrue((weights >= lower - 1e-12).all() and (weights <= upper + 1e-12).all())
+    def test_02_unbounded(self) :
+        daily = T.prices.pct_change().dropna()
+        cov_matrix = daily.cov().values
+        max_sharpe, min_risk = FRONTIER.find(T.prices, T.stock_list, 0.02, 252, (-10, 10))
+        weights = np.linalg.solve(cov_matrix, daily.mean().values * 252 - 0.02)
+        np.testing.assert_allclose(max_sharpe[T.stock_list].values, weights / weights.sum(), atol=1e-8)
+        weights = np.linalg.solve(cov_matrix, np.ones(len(T.stock_list)))
+        np.testing.assert_allclose(min_risk[T.stock_list].values, weights / weights.sum(), atol=1e-8)
+    def test_03_two(self) :
+        stock_list = T.stock_list[:2]
+        cov_matrix = T.prices[stock_list].pct_change().cov().values
+        max_sharpe, min_risk = FRONTIER.find(T.prices[stock_list], stock_list, 0.02, 252, (0, 1))
+        weight = (cov_matrix[1, 1] - cov_matrix[0, 1]) / (cov_matrix[0, 0] + cov_matrix[1, 1] - 2 * cov_matrix[0, 1])
+        weight = min(max(weight, 0), 1)
+        self.assertAlmostEqual(min_risk[stock_list[0]], weight)
+    def test_04_no_excess(self) :
+        max_sharpe, min_risk = PORTFOLIO.find(T.prices, stocks=T.stock_list, method='frontier', risk_free_rate=5)
+        self.assertGreaterEqual(max_sharpe['sharpe'], min_risk['sharpe'])
+        self.assertAlmostEqual(max_sharpe[T.stock_list].sum(), 1)
+        ret = FRONTIER.find(T.prices, T.stock_list, 0.02, 252, (0.3, 1))
+        self.assertTrue(ret[0].empty)
+
+if __name__ == '__main__' :
+
+   import sys
+
+   log_msg = '%(module)s.%(funcName)s(%(lineno)s) %(levelname)s - %(message)s'
+   logging.basicConfig(stream=sys.stdout, format=log_msg, level=logging.INFO)
+
+   unittest.main()
@@ -0,0 +1,449 @@
+#!/usr/bin/python
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import context
+
+from libFinance import STOCK_TIMESERIES, TRANSFORM_BACKGROUND, HELPER
+from concurrent.futures import ProcessPoolExecutor
+from libStore import PRICE_STORE, MANIFEST, SHARED_MATRIX, CALENDAR
+from libUtils import prefetch
+from libBackground import EXTRACT_TICKER
+
+def make_prices(ticker, start, periods, seed=0) :
+    prices = context.make_prices([ticker], periods, start, seed, mu=0, sigma=0.01)[ticker]
+    ret = pd.DataFrame({'Open' : prices, 'High' : prices * 1.01, 'Low' : prices * 0.99
+                       , 'Close' : prices, 'Adj Close' : prices, 'Volume' : np.arange(periods) * 100.0})
+    return ret
+
+def column_sum(spec) :
+    with SHARED_MATRIX.attach(spec) as ret :
+         return np.nansum(ret.values, axis=0).tolist()
+
+class T() :
+    stock_list = { 'AAPL' : ('2019-01-01', 300), 'IBM' : ('2019-03-01', 200), 'SPY' : ('2018-06-01', 400) }
+    @classmethod
+    def save(cls, local_dir) :
+        ret = []
+        for i, stock in enumerate(sorted(cls.stock_list)) :
+            start, periods = cls.stock_list[stock]
+            filename = '{}/{}.pkl'.format(local_dir, stock)
+            STOCK_TIMESERIES.save(filename, stock, make_prices(stock, start, periods, i))
+            ret.append(filename)
+        return ret
+
+class OFFLINE(STOCK_TIMESERIES) :
+    '''
+    serves a fixed history instead of yahoo, recording every request
+    '''
+    history = None
+    requests = []
+    def extract_from_yahoo(self, stock) :
+        OFFLINE.requests.append((stock, self.start, self.end))
+        ret = OFFLINE.history
+        ret = ret[(ret.index >= self.start) & (ret.index <= self.end)]
+        return ret.copy()
+
+class TEST_01_STORE(unittest.TestCase):
+    def setUp(self) :
+        self.local_dir = tempfile.mkdtemp()
+        self.file_list = T.save(self.local_dir)
+        self.path = '{}/price_store'.format(self.local_dir)
+    def tearDown(self) :
+        shutil.rmtree(self.local_dir)
+
+    def test_01_build(self) :
+        self.assertFalse(PRICE_STORE.exists(self.path))
+        store = STOCK_TIMESERIES.consolidate(self.path, self.file_list)
+        self.assertTrue(PRICE_STORE.exists(self.path))
+        self.assertEqual(sorted(store.tickers), sorted(T.stock_list))
+        self.assertTrue(store.dates.is_monotonic_increasing)
+        logging.info(str(store))
+    def test_02_matrix(self) :
+        STOCK_TIMESERIES.consolidate(self.path, self.file_list)
+        store = PRICE_STORE.open(self.path)
+        ret = store.matrix('Adj Close')
+        self.assertIsInstance(ret, np.memmap)
+        self.assertEqual(ret.shape, (len(store.dates), len(store.tickers)))
+    def test_03_read(self) :
+        STOCK_TIMESERIES.consolidate(self.path, self.file_list)
+        store = PRICE_STORE.open(self.path)
+        ret = store.read('Adj Close', ['IBM', 'AAPL', 'MISSING'])
+        self.assertEqual(list(ret.columns), ['IBM', 'AAPL'])
+        for stock in ['IBM', 'AAPL'] :
+            name, data = STOCK_TIMESERIES.load('{}/{}.pkl'.format(self.local_dir, stock))
+            test = ret[stock].dropna()
+            np.testing.assert_array_equal(test.index.values, data.index.values)
+            np.testing.assert_allclose(test.values, data['Adj Close'].values)
+    def test_04_series(self) :
+        STOCK_TIMESERIES.consolidate(self.path, self.file_list)
+        store = PRICE_STORE.open(self.path)
+        ret = store.series('SPY', 'Volume')
+        self.assertEqual(len(ret), T.stock_list['SPY'][1])
+        self.assertNotIn('MISSING', store)
+    def test_05_log_index(self) :
+        store = STOCK_TIMESERIES.consolidate(self.path, self.file_list)
+        self.assertIn('Log Index', store.fields)
+        ret = store.series('IBM', 'Log Index')
+        prices = store.series('IBM')
+        np.testing.assert_allclose(ret.values, np.log(prices / prices.iloc[0]).values)
+        returns = STOCK_TIMESERIES.load_returns(self.file_list[1])
+        np.testing.assert_allclose(returns['cumulative'].values, ret.values)
+    def test_06_rebuild(self) :
+        old = STOCK_TIMESERIES.consolidate(self.path, self.file_list, frequency_list=[])
+        matrix = old.matrix('Adj Close')
+        test = np.array(matrix)
+        ret = STOCK_TIMESERIES.consolidate(self.path, self.file_list[:1], frequency_list=[])
+        self.assertEqual(PRICE_STORE.open(self.path).tickers, ret.tickers)
+        self.assertEqual(ret.matrix('Adj Close').shape, (len(ret.dates), 1))
+        np.testing.assert_array_equal(matrix, test)
+        self.assertEqual(os.listdir(self.local_dir).count('price_store'), 1)
+        self.assertEqual([ name for name in os.listdir(self.local_dir) if name.startswith('.') ], [])
+
+class TEST_02_MANIFEST(unittest.TestCase):
+    def setUp(self) :
+        self.local_dir = tempfile.mkdtemp()
+        self.file_list = T.save(self.local_dir)
+    def tearDown(self) :
+        shutil.rmtree(self.local_dir)
+
+    def test_01_build(self) :
+        ret = STOCK_TIMESERIES.manifest(self.local_dir)
+        self.assertTrue(os.path.exists(MANIFEST.filename(self.local_dir)))
+        self.assertEqual(sorted(ret.entries), sorted(T.stock_list))
+        start, periods = T.stock_list['IBM']
+        self.assertEqual(ret['IBM']['rows'], periods)
+        self.assertEqual(ret['IBM']['first'], start)
+    def test_02_lookup(self) :
+        ret = STOCK_TIMESERIES.lookup(self.file_list)
+        self.assertEqual(ret['AAPL'], '{}/AAPL.pkl'.format(self.local_dir))
+        ret = STOCK_TIMESERIES.lookup(self.file_list[:1])
+        self.assertEqual(len(ret), 1)
+    def test_03_refresh(self) :
+        STOCK_TIMESERIES.manifest(self.local_dir)
+        filename = '{}/QQQ.pkl'.format(self.local_dir)
+        STOCK_TIMESERIES.save(filename, 'QQQ', make_prices('QQQ', '2020-01-01', 50))
+        os.remove('{}/SPY.pkl'.format(self.local_dir))
+        ret = STOCK_TIMESERIES.manifest(self.local_dir)
+        self.assertIn('QQQ', ret)
+        self.assertNotIn('SPY', ret)
+        self.assertEqual(ret['QQQ']['rows'], 50)
+    def test_04_read(self) :
+        ret = STOCK_TIMESERIES.read(self.file_list, ['SPY', 'AAPL', 'MISSING'])
+        ret = dict(ret)
+        self.assertEqual(sorted(ret), ['AAPL', 'SPY'])
+    def test_05_truncated(self) :
+        STOCK_TIMESERIES.manifest(self.local_dir)
+        filename = MANIFEST.filename(self.local_dir)
+        with open(filename, 'r+') as fp :
+             fp.truncate(20)
+        MANIFEST._cache.clear()
+        ret = STOCK_TIMESERIES.lookup(self.file_list)
+        self.assertEqual(sorted(ret), sorted(T.stock_list))
+        self.assertEqual(sorted(MANIFEST.read(self.local_dir)), sorted(T.stock_list))
+        self.assertEqual([ name for name in os.listdir(self.local_dir) if name.endswith('.tmp') ], [])
+
+class TEST_03_PANEL(unittest.TestCase):
+    def setUp(self) :
+        self.local_dir = tempfile.mkdtemp()
+        self.file_list = T.save(self.local_dir)
+    def tearDown(self) :
+        shutil.rmtree(self.local_dir)
+
+    def test_01_read_all(self) :
+        name_list, ret = STOCK_TIMESERIES.read_all(self.file_list, sorted(T.stock_list))
+        self.assertEqual(name_list, sorted(T.stock_list))
+        self.assertEqual(ret.columns.nlevels, 2)
+        self.assertTrue(ret.index.is_monotonic_increasing)
+        test = STOCK_TIMESERIES.flatten('Adj Close', ret)
+        for stock in name_list :
+            name, data = STOCK_TIMESERIES.load('{}/{}.pkl'.format(self.local_dir, stock))
+            np.testing.assert_allclose(test[stock].dropna().values, data['Adj Close'].values)
+    def test_02_projection(self) :
+        name_list, ret = STOCK_TIMESERIES.read_all(self.file_list, ['IBM','SPY'], 'Adj Close')
+        self.assertEqual(list(ret.columns), name_list)
+        name_list, test = STOCK_TIMESERIES.read_all(self.file_list, ['IBM','SPY'])
+        test = STOCK_TIMESERIES.flatten('Adj Close', test)
+        pd.testing.assert_frame_equal(ret, test, check_names=False)
+    def test_03_empty(self) :
+        name_list, ret = STOCK_TIMESERIES.read_all(self.file_list, ['MISSING'])
+        self.assertEqual(name_list, [])
+        self.assertIsNone(ret)
+    def test_04_bad_ticker(self) :
+        data = [ (stock, make_prices(stock, *T.stock_list[stock])) for stock in sorted(T.stock_list) ]
+        bad = data[1][1][['Adj Close']].astype(object)
+        bad.iloc[0, 0] = 'n/a'
+        logging.disable(logging.ERROR)
+        name_list, ret = STOCK_TIMESERIES.panel([data[0], ('BAD', bad), data[2]], 'Adj Close')
+        logging.disable(logging.NOTSET)
+        self.assertEqual(name_list, [data[0][0], data[2][0]])
+        for stock, test in [data[0], data[2]] :
+            np.testing.assert_allclose(ret[stock].dropna().values, test['Adj Close'].values)
+            np.testing.assert_array_equal(ret[stock].dropna().index.values, test.index.values)
+
+class TEST_04_REFRESH(unittest.TestCase):
+    def setUp(self) :
+        self.local_dir = tempfile.mkdtemp()
+        self.filename = '{}/AAPL.pkl'.format(self.local_dir)
+        OFFLINE.history = make_prices('AAPL', '2019-01-01', 300)
+        OFFLINE.requests = []
+    def tearDown(self) :
+        shutil.rmtree(self.local_dir)
+    def reader(self, end) :
+        end = pd.Timestamp(end)
+        return OFFLINE(end - pd.Timedelta(days=3650), end)
+
+    def test_01_full(self) :
+        ret = self.reader('2019-06-28').refresh(self.filename, 'AAPL')
+        self.assertTrue(os.path.exists(self.filename))
+        self.assertEqual(ret.index[-1], pd.Timestamp('2019-06-28'))
+    def test_02_append(self) :
+        self.reader('2019-06-28').refresh(self.filename, 'AAPL')
+        ret = self.reader('2019-07-31').refresh(self.filename, 'AAPL')
+        stock, start, end = OFFLINE.requests[-1]
+        self.assertGreater(start, pd.Timestamp('2019-06-01'))
+        name, test = STOCK_TIMESERIES.load(self.filename)
+        self.assertEqual(test.index[-1], pd.Timestamp('2019-07-31'))
+        self.assertFalse(test.index.duplicated().any())
+        np.testing.assert_allclose(test['Adj Close'].values, OFFLINE.history.loc[:'2019-07-31','Adj Close'].values)
+    def test_03_up_to_date(self) :
+        self.reader('2019-06-28').refresh(self.filename, 'AAPL')
+        self.reader('2019-06-28').refresh(self.filename, 'AAPL')
+        self.assertEqual(len(OFFLINE.requests), 1)
+    def test_04_restated(self) :
+        self.reader('2019-06-28').refresh(self.filename, 'AAPL')
+        OFFLINE.history = OFFLINE.history.copy()
+        OFFLINE.history['Adj Close'] *= 0.5
+        self.reader('2019-07-31').refresh(self.filename, 'AAPL')
+        self.assertEqual(len(OFFLINE.requests), 3)
+        name, test = STOCK_TIMESERIES.load(self.filename)
+        np.testing.assert_allclose(test['Adj Close'].values, OFFLINE.history.loc[:'2019-07-31','Adj Close'].values)
+
+class TEST_05_PREFETCH(unittest.TestCase):
+    def setUp(self) :
+        self.local_dir = tempfile.mkdtemp()
+        self.file_list = T.save(self.local_dir)
+    def tearDown(self) :
+        shutil.rmtree(self.local_dir)
+
+    def test_01_ordered(self) :
+        ret = prefetch(lambda x : x * x, range(20), workers=3, read_ahead=2)
+        self.assertEqual(list(ret), [ (x, x * x) for x in range(20) ])
+    def test_02_unordered(self) :
+        ret = prefetch(lambda x : x * x, range(20), workers=3, ordered=False)
+        self.assertEqual(sorted(ret), [ (x, x * x) for x in range(20) ])
+    def test_03_bulk(self) :
+        test = list(STOCK_TIMESERIES.bulk(self.file_list))
+        for kwargs in [ {'workers' : 2}, {'workers' : 2, 'processes' : True}, {'workers' : 2, 'read_ahead' : 1} ] :
+            ret = list(STOCK_TIMESERIES.bulk(self.file_list, **kwargs))
+            self.assertEqual([ x[0] for x in ret ], [ x[0] for x in test ])
+            for i, value in enumerate(ret) :
+                pd.testing.assert_frame_equal(value[1], test[i][1])
+
+class TEST_06_COMPACT(unittest.TestCase):
+    def setUp(self) :
+        self.local_dir = tempfile.mkdtemp()
+        self.data = make_prices('AAPL', '2019-01-01', 300)
+        self.data['Volume'] = self.data['Volume'].astype(np.int64)
+    def tearDown(self) :
+        shutil.rmtree(self.local_dir)
+
+    def test_01_compact(self) :
+        test = '{}/test.pkl'.format(self.local_dir)
+        STOCK_TIMESERIES.save(test, 'AAPL', self.data.copy())
+        for compression in [None, 'gzip', 'xz'] :
+            filename = '{}/AAPL_{}.pkl'.format(self.local_dir, compression)
+            STOCK_TIMESERIES.save(filename, 'AAPL', self.data.copy(), compact=True, compression=compression)
+            self.assertLess(os.path.getsize(filename), os.path.getsize(test))
+            name, ret = STOCK_TIMESERIES.load(filename)
+            self.assertEqual(name, 'AAPL')
+            self.assertNotIn('Stock', ret)
+            self.assertEqual(ret['Adj Close'].dtype, np.float64)
+            self.assertEqual(ret['Volume'].dtype, np.int64)
+            np.testing.assert_allclose(ret['Adj Close'].values, self.data['Adj Close'].values, rtol=1e-6)
+    def test_02_store(self) :
+        path = '{}/price_store'.format(self.local_dir)
+        store = PRICE_STORE.build(path, [('AAPL', self.data)], dtype=np.float32)
+        self.assertEqual(store.matrix('Adj Close').dtype, np.float32)
+        ret = store.read('Adj Close', ['AAPL'])
+        self.assertEqual(ret['AAPL'].dtype, np.float64)
+        np.testing.assert_allclose(ret['AAPL'].values, self.data['Adj Close'].values, rtol=1e-6)
+
+class TEST_07_SHARED(unittest.TestCase):
+    def setUp(self) :
+        self.local_dir = tempfile.mkdtemp()
+        self.file_list = T.save(self.local_dir)
+    def tearDown(self) :
+        shutil.rmtree(self.local_dir)
+
+    def test_01_share(self) :
+        prices, returns = STOCK_TIMESERIES.share(self.file_list, sorted(T.stock_list))
+        with prices, returns :
+             name_list, test = STOCK_TIMESERIES.read_all(self.file_list, sorted(T.stock_list), 'Adj Close')
+             pd.testing.assert_frame_equal(prices.frame(), test, check_names=False)
+             self.assertEqual(returns.values.shape[1], len(T.stock_list))
+             with ProcessPoolExecutor(max_workers=2) as pool :
+                  ret = list(pool.map(column_sum, [prices.spec, prices.spec]))
+             for value in ret :
+                 np.testing.assert_allclose(value, np.nansum(test.values, axis=0))
+
+class TEST_08_RETURNS(unittest.TestCase):
+    def setUp(self) :
+        self.local_dir = tempfile.mkdtemp()
+        self.filename = '{}/AAPL.pkl'.format(self.local_dir)
+        self.data = make_prices('AAPL', '2019-01-01', 300)
+        STOCK_TIMESERIES.save(self.filename, 'AAPL', self.data.copy())
+    def tearDown(self) :
+        shutil.rmtree(self.local_dir)
+
+    def test_01_save(self) :
+        self.assertTrue(os.path.exists(STOCK_TIMESERIES.returns_filename(self.filename)))
+        self.assertEqual(STOCK_TIMESERIES.lookup([self.filename]), {'AAPL' : self.filename})
+    def test_02_load(self) :
+        ret = STOCK_TIMESERIES.load_returns(self.filename)
+        test = self.data['Adj Close'].pct_change()
+        np.testing.assert_allclose(ret['daily'].values[1:], test.values[1:])
+        np.testing.assert_allclose(ret['log'].values[1:], np.log1p(test.values[1:]))
+    def test_03_stale(self) :
+        data = make_prices('AAPL', '2019-01-01', 320, seed=1)
+        STOCK_TIMESERIES.derive = False
+        try :
+           STOCK_TIMESERIES.save(self.filename, 'AAPL', data.copy())
+        finally :
+           STOCK_TIMESERIES.derive = True
+        ret = STOCK_TIMESERIES.load_returns(self.filename)
+        self.assertEqual(len(ret), 320)
+        np.testing.assert_allclose(ret['daily'].values[1:], data['Adj Close'].pct_change().values[1:])
+    def test_04_background(self) :
+        name, data = STOCK_TIMESERIES.load(self.filename)
+        test = TRANSFORM_BACKGROUND.find(data)
+        data['daily'] = STOCK_TIMESERIES.load_returns(self.filename)['daily']
+        ret = TRANSFORM_BACKGROUND.find(data)
+        self.assertEqual(sorted(ret), sorted(test))
+        for key in test :
+            self.assertAlmostEqual(ret[key], test[key])
+    def test_05_threads(self) :
+        ticker_list = [ 'T{}'.format(i) for i in range(8) ]
+        STOCK_TIMESERIES.derive = False
+        try :
+           for i, ticker in enumerate(ticker_list) :
+               STOCK_TIMESERIES.save('{}/{}.pkl'.format(self.local_dir, ticker), ticker, make_prices(ticker, '2019-01-01', 300, i))
+        finally :
+           STOCK_TIMESERIES.derive = True
+        shutil.rmtree('{}/returns'.format(self.local_dir))
+        ret = dict(EXTRACT_TICKER.load_list(self.local_dir, ticker_list, workers=8))
+        for ticker in ticker_list :
+            self.assertIsNotNone(ret[ticker])
+            self.assertIn('daily', ret[ticker])
+            self.assertTrue(os.path.exists(STOCK_TIMESERIES.returns_filename('{}/{}.pkl'.format(self.local_dir, ticker))))
+        self.assertEqual([ name for name in os.listdir('{}/returns'.format(self.local_dir)) if name.endswith('.tmp') ], [])
+
+class TEST_09_WINDOW(unittest.TestCase):
+    def setUp(self) :
+        self.local_dir = tempfile.mkdtemp()
+        self.file_list = T.save(self.local_dir)
+        self.filename = '{}/AAPL.pkl'.format(self.local_dir)
+        name, self.data = STOCK_TIMESERIES.load(self.filename)
+    def tearDown(self) :
+        shutil.rmtree(self.local_dir)
+
+    def test_01_load(self) :
+        start, end = '2019-03-01', '2019-06-30'
+        name, ret = STOCK_TIMESERIES.load(self.filename, start, end, ['Adj Close','Volume','MISSING'])
+        test = self.data.loc[start:end, ['Adj Close','Volume']]
+        pd.testing.assert_frame_equal(ret, test)
+        name, ret = STOCK_TIMESERIES.load(self.filename, end='2000-01-01')
+        self.assertEqual(len(ret), 0)
+    def test_02_read_all(self) :
+        start = self.data.index[100]
+        name_list, ret = STOCK_TIMESERIES.read_all(self.file_list, ['AAPL','IBM'], 'Adj Close', start=start)
+        self.assertEqual(ret.index[0], start)
+        test = self.data['Adj Close'].iloc[100:]
+        np.testing.assert_array_equal(ret['AAPL'].dropna().index.values, test.index.values)
+        np.testing.assert_allclose(ret['AAPL'].dropna().values, test.values)
+    def test_03_store(self) :
+        store = STOCK_TIMESERIES.consolidate('{}/price_store'.format(self.local_dir), self.file_list)
+        start, end = self.data.index[10], self.data.index[50]
+        ret = store.read('Adj Close', ['AAPL'], start, end)
+        test = store.read('Adj Close', ['AAPL']).loc[start:end]
+        pd.testing.assert_frame_equal(ret, test)
+        ret = store.series('AAPL', start=start, end=end)
+        self.assertEqual(len(ret), 41)
+
+class TEST_10_CALENDAR(unittest.TestCase):
+    def setUp(self) :
+        dates = pd.bdate_range('2020-01-01', periods=10)
+        self.a = pd.Series(np.arange(10.0), index=dates).drop(dates[[3,4]])
+        self.b = pd.Series(np.arange(6.0) + 100, index=dates[4:]).drop(dates[6])
+        self.data = {'a' : self.a, 'b' : self.b}
+
+    def test_01_bfill(self) :
+        ret = CALENDAR().align(self.data, fill='bfill', head='bfill')
+        test = pd.DataFrame(self.data).fillna(method='bfill')
+        np.testing.assert_array_equal(ret.index.values, test.index.values)
+        np.testing.assert_array_equal(ret.values, test.values)
+    def test_02_ffill(self) :
+        ret = CALENDAR().align(self.data)
+        test = pd.DataFrame(self.data).fillna(method='ffill')
+        np.testing.assert_array_equal(ret.values, test.values)
+        self.assertTrue(ret['b'].iloc[:3].isnull().all())
+    def test_03_head(self) :
+        ret = CALENDAR().align(self.data, fill=None, head='zero')
+        self.assertEqual(list(ret['b'].iloc[:3]), [0.0, 0.0, 0.0])
+        self.assertEqual(ret['b'].isnull().sum(), 1)
+        self.assertRaises(ValueError, CALENDAR().align, self.data, 'median')
+    def test_04_offsets(self) :
+        calendar = CALENDAR(self.a.index)
+        self.assertEqual(len(calendar), 8)
+        ret = calendar.offsets(self.data)
+        self.assertEqual(len(calendar), 9)
+        self.assertEqual(ret.to_dict(), {'a' : 0, 'b' : 3})
+
+class TEST_11_RESAMPLE(unittest.TestCase):
+    def setUp(self) :
+        self.local_dir = tempfile.mkdtemp()
+        self.file_list = T.save(self.local_dir)
+        self.path = '{}/price_store'.format(self.local_dir)
+        self.store = STOCK_TIMESERIES.consolidate(self.path, self.file_list)
+    def tearDown(self) :
+        shutil.rmtree(self.local_dir)
+
+    def test_01_build(self) :
+        self.assertEqual(self.store.frequency, 'daily')
+        for frequency in HELPER.FREQUENCY :
+            ret = self.store.resampled(frequency)
+            self.assertEqual(ret.frequency, frequency)
+            self.assertEqual(ret.fields, ['Adj Close', 'Returns', 'Log Index'])
+            self.assertEqual(sorted(ret.tickers), sorted(T.stock_list))
+        self.assertRaises(KeyError, self.store.resampled, 'yearly')
+    def test_02_monthly(self) :
+        ret = self.store.resampled('monthly')
+        test = self.store.read().resample(HELPER.RESAMPLE_MONTH).last().dropna(how='all')
+        pd.testing.assert_frame_equal(ret.read(), test, check_freq=False)
+        for stock in T.stock_list :
+            close = ret.series(stock)
+            np.testing.assert_allclose(ret.series(stock, 'Returns').values, close.pct_change().dropna().values)
+        self.assertTrue(len(ret.dates) * 15 < len(self.store.dates))
+    def test_03_quarterly(self) :
+        ret = self.store.resampled('quarterly')
+        self.assertTrue(ret.dates.is_quarter_end.all())
+        self.assertEqual(HELPER.periods(ret.frequency), 4)
+        self.assertEqual(HELPER.periods(self.store.frequency), HELPER.YEAR)
+    def test_04_none(self) :
+        path = '{}/daily_only'.format(self.local_dir)
+        STOCK_TIMESERIES.consolidate(path, self.file_list, frequency_list=[])
+        self.assertFalse(PRICE_STORE.exists('{}/monthly'.format(path)))
+
+if __name__ == '__main__' :
+
+   import sys
+
+   log_msg = '%(module)s.%(funcName)s(%(lineno)s) %(levelname)s - %(message)s'
+   logging.basicConfig(stream=sys.stdout, format=log_msg, level=logging.INFO)
+
+   unittest.main()